@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from streaming import top_crimes_per_force
+from seasonality import SeasonalityCube
+from regions import get_region
+from density import kde_grid
+
+# The numbers behind every chart, as plain tables.
+# These functions only need pandas; the matching charts are in plots.py.
+
+# The key category for an "unsolved" crime.
+UNSOLVED_CATEGORY = 'Investigation complete; no suspect identified'
+
+population_data = {
+    'Thames Valley Police': 2340000,
+    'Cambridgeshire Constabulary': 678600,
+    'Metropolitan Police Service': 9000000
+}
+
+# Quadrants of the priority matrix, split at the area's median volume and unsolved rate.
+CHRONIC = 'Chronic problems'       # high volume, high unsolved rate
+NICHE = 'Niche challenges'         # low volume, high unsolved rate
+WELL_MANAGED = 'Well-managed'      # low volume, low unsolved rate
+EFFECTIVE = 'Effective process'    # high volume, low unsolved rate
+
+# Area levels of the priority table and the columns that identify an area.
+PRIORITY_LEVELS = {
+    'Force': ['Falls within'],
+    'District': ['Falls within', 'District'],
+    'LSOA': ['Falls within', 'LSOA code'],
+}
+
+THEFT_CATEGORIES = [
+    'Bicycle theft', 'Shoplifting', 'Theft from the person', 'Other theft',
+    'Burglary', 'Robbery', 'Vehicle crime'
+]
+
+
+def top_crime_counts(crime_counts, n=5):
+    """Counts per force for the union of every force's n most frequent crime types.
+
+    crime_counts is indexed by ('Falls within', 'Crime type').
+    """
+    per_type = crime_counts.groupby(level=['Falls within', 'Crime type']).sum()
+    unique_top_crimes = pd.Index(top_crimes_per_force(per_type, n).explode().unique())
+
+    plot_df = per_type.rename('Count').reset_index()
+    plot_df = plot_df[plot_df['Crime type'].isin(unique_top_crimes)]
+    return plot_df.astype({'Crime type': str, 'Falls within': str}).reset_index(drop=True)
+
+
+def crime_rates(force_counts, population=population_data, years=2):
+    """Average annual crimes per 1,000 people for each force.
+
+    force_counts holds the total crimes per force over a period of `years`
+    (e.g. TimeIndex.years, the span of the loaded data).
+    """
+    crime_counts = force_counts.rename('Total Crimes').rename_axis('Police Force').reset_index()
+    crime_counts['Police Force'] = crime_counts['Police Force'].astype(str)
+    crime_counts['Population'] = crime_counts['Police Force'].map(population)
+    crime_counts['Avg Annual Crime Rate per 1000'] = (crime_counts['Total Crimes'] / crime_counts['Population'] / years) * 1000
+    return crime_counts
+
+
+def seasonal_rates(monthly_counts, population=population_data):
+    """Average count and rate per 100k people for each calendar month.
+
+    monthly_counts is indexed by ('Falls within', 'Crime type', 'Month').
+    Months without any crime of a type count as zero. See seasonality.py for
+    the seasonal indices and year-over-year changes.
+    """
+    return SeasonalityCube.from_counts(monthly_counts).table(population)
+
+
+def classify_quadrants(priority_df, by=()):
+    """Adds each area's median volume and unsolved rate and the quadrant of every row.
+
+    by lists the columns that identify an area; without any, priority_df is
+    one area. Only values above a median count as high, so ties are low on
+    both axes: where an area's median unsolved rate is 0, crime types that
+    are never unsolved are not chronic problems.
+    """
+    by = list(by)
+    values = priority_df[['Total Volume', 'Unsolved Rate (%)']]
+    medians = values.groupby([priority_df[c] for c in by]).transform('median') if by else values.median()
+    priority_df['Volume Median'] = medians['Total Volume']
+    priority_df['Unsolved Rate Median'] = medians['Unsolved Rate (%)']
+    high_volume = priority_df['Total Volume'] > priority_df['Volume Median']
+    high_rate = priority_df['Unsolved Rate (%)'] > priority_df['Unsolved Rate Median']
+    priority_df['Quadrant'] = np.select(
+        [high_volume & high_rate, high_rate, high_volume], [CHRONIC, NICHE, EFFECTIVE], default=WELL_MANAGED)
+    return priority_df
+
+
+def priority_matrix(area_df, unsolved_category=UNSOLVED_CATEGORY):
+    """Total volume, unsolved rate and quadrant of every crime type in one area's rows."""
+    total_crimes = area_df['Crime type'].value_counts()
+    total_crimes = total_crimes[total_crimes > 0]
+
+    is_unsolved = area_df['Last outcome category'] == unsolved_category
+    unsolved_crimes = area_df.loc[is_unsolved, 'Crime type'].value_counts()
+    unsolved_rate = (unsolved_crimes / total_crimes * 100).reindex(total_crimes.index).fillna(0)
+
+    priority_df = pd.DataFrame({
+        'Total Volume': total_crimes,
+        'Unsolved Rate (%)': unsolved_rate
+    }).rename_axis('Crime type').reset_index()
+    priority_df['Crime type'] = priority_df['Crime type'].astype(str)
+    return classify_quadrants(priority_df)
+
+
+def lsoa_district(lsoa_names):
+    """District of police.uk LSOA names: 'Oxford 008A' -> 'Oxford'."""
+    return pd.Series(lsoa_names, dtype=object).str.replace(r'\s+\S+$', '', regex=True)
+
+
+def priority_table(crime_df, unsolved_category=UNSOLVED_CATEGORY, levels=tuple(PRIORITY_LEVELS)):
+    """Priority matrix of every force, district and LSOA in one table.
+
+    The rows are counted once per (force, LSOA, crime type); the districts
+    (from the LSOA names) and forces are rolled up from those counts. Medians
+    and quadrants are computed per area. Returns one row per area and crime
+    type: Level, Falls within, Area, Crime type, Total Volume, Unsolved,
+    Unsolved Rate (%), the area's medians and the Quadrant.
+    """
+    is_unsolved = (crime_df['Last outcome category'] == unsolved_category).rename('Unsolved')
+    counts = is_unsolved.groupby(
+        [crime_df['Falls within'], crime_df['LSOA code'], crime_df['LSOA name'], crime_df['Crime type']],
+        observed=True, dropna=False
+    ).agg(['size', 'sum']).reset_index()
+    counts = counts[counts['size'] > 0]
+    names = counts['LSOA name'].astype(object)
+    districts = lsoa_district(names.dropna().unique())
+    counts['District'] = names.map(dict(zip(names.dropna().unique(), districts)))
+
+    tables = []
+    for level in levels:
+        keys = PRIORITY_LEVELS[level]
+        table = counts.groupby(keys + ['Crime type'], observed=True)[['size', 'sum']].sum().reset_index()
+        table = table.rename(columns={keys[-1]: 'Area'}) if len(keys) > 1 else table.assign(Area=table['Falls within'])
+        table.insert(0, 'Level', level)
+        tables.append(table[['Level', 'Falls within', 'Area', 'Crime type', 'size', 'sum']])
+
+    priority_df = pd.concat(tables, ignore_index=True).rename(columns={'size': 'Total Volume', 'sum': 'Unsolved'})
+    priority_df = priority_df.astype({'Falls within': str, 'Area': str, 'Crime type': str, 'Unsolved': 'int64'})
+    priority_df['Unsolved Rate (%)'] = priority_df['Unsolved'] / priority_df['Total Volume'] * 100
+    return classify_quadrants(priority_df, by=['Level', 'Falls within', 'Area'])
+
+
+def area_priority(priority_df, area, level=None):
+    """The rows of one area from priority_table(), ready for plot_priority_matrix()."""
+    rows = priority_df['Area'] == area
+    if level is not None:
+        rows &= priority_df['Level'] == level
+    return priority_df[rows].reset_index(drop=True)
+
+
+def region_density(crime_df, region):
+    """Density of crime_df's points evaluated over a region's bounds (the theft hotspot map)."""
+    region = get_region(region)
+    return kde_grid(crime_df['Longitude'], crime_df['Latitude'], bounds=(region.lon_bounds, region.lat_bounds))
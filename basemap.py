@@ -0,0 +1,199 @@
+import os
+import math
+import shutil
+import argparse
+import urllib.request
+import numpy as np
+from loader import cache_folder_path
+from instrument import traced
+
+# Local slippy-map tile store for the map backgrounds.
+# Tiles live on disk as <provider>/<z>/<x>/<y>.png. Rendering only ever reads
+# the store and never touches the network: tiles are seeded from a directory
+# of tiles or prefetched for the registered regions beforehand. The tiles of a
+# region are stitched and reprojected to lon/lat once, and the raster is
+# reused for every map of that region.
+#
+#   python basemap.py --prefetch              # download the tiles of every region
+#   python basemap.py --seed <tile folder>    # copy <z>/<x>/<y>.png tiles in
+
+TILE_PROVIDERS = {
+    'OpenStreetMap.Mapnik': 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+}
+TILE_SIZE = 256
+
+tile_folder_path = os.path.join(cache_folder_path, 'tiles') if cache_folder_path else 'tiles'
+
+
+def tile_x(lon, zoom):
+    """Fractional slippy-map tile column of a longitude (Web Mercator)."""
+    return (lon + 180.0) / 360.0 * 2 ** zoom
+
+
+def tile_y(lat, zoom):
+    """Fractional slippy-map tile row of a latitude (Web Mercator)."""
+    return (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * 2 ** zoom
+
+
+def auto_zoom(lon_bounds, lat_bounds, max_zoom=19):
+    """Picks the zoom contextily would use for this extent."""
+    zoom_lon = math.ceil(math.log2(360 * 2.0 / max(lon_bounds[1] - lon_bounds[0], 1e-9)))
+    zoom_lat = math.ceil(math.log2(170 * 2.0 / max(lat_bounds[1] - lat_bounds[0], 1e-9)))
+    return min(max(zoom_lon, zoom_lat, 0), max_zoom)
+
+
+def tile_range(lon_bounds, lat_bounds, zoom):
+    """First and last tile column and row covering the bounds."""
+    x0, x1 = int(tile_x(lon_bounds[0], zoom)), int(tile_x(lon_bounds[1], zoom))
+    y0, y1 = int(tile_y(lat_bounds[1], zoom)), int(tile_y(lat_bounds[0], zoom))
+    return x0, x1, y0, y1
+
+
+class TileStore:
+    """On-disk tiles of one provider plus the basemap rasters built from them."""
+
+    def __init__(self, tile_dir=tile_folder_path, provider='OpenStreetMap.Mapnik'):
+        self.tile_dir = tile_dir
+        self.provider = provider
+        self._rasters = {}
+
+    def tile_path(self, z, x, y):
+        return os.path.join(self.tile_dir, self.provider, str(z), str(x), f'{y}.png')
+
+    def seed(self, source_dir):
+        """Copies every <z>/<x>/<y>.png tile found under source_dir into the store."""
+        copied = 0
+        for root, dirs, files in os.walk(source_dir):
+            for file in files:
+                parts = os.path.relpath(os.path.join(root, file), source_dir).split(os.sep)[-3:]
+                if len(parts) != 3 or not file.endswith('.png'):
+                    continue
+                z, x, y = parts[0], parts[1], parts[2][:-len('.png')]
+                if not (z.isdigit() and x.isdigit() and y.isdigit()):
+                    continue
+                target = self.tile_path(z, x, y)
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(os.path.join(root, file), target)
+                    copied += 1
+        return copied
+
+    def _download(self, z, x, y):
+        url = TILE_PROVIDERS[self.provider].format(z=z, x=x, y=y)
+        request = urllib.request.Request(url, headers={'User-Agent': 'uk-crime-analysis'})
+        target = self.tile_path(z, x, y)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(request, timeout=10) as response, open(target + '.tmp', 'wb') as f:
+            f.write(response.read())
+        os.replace(target + '.tmp', target)
+
+    def prefetch(self, lon_bounds, lat_bounds, zoom=None, threads=8):
+        """Downloads the missing tiles of the basemap of these bounds. Returns how many were fetched."""
+        from concurrent.futures import ThreadPoolExecutor
+        zoom = auto_zoom(lon_bounds, lat_bounds) if zoom is None else zoom
+        x0, x1, y0, y1 = tile_range(lon_bounds, lat_bounds, zoom)
+        missing = [(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                   if not os.path.exists(self.tile_path(zoom, x, y))]
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda tile: self._download(*tile), missing))
+        return len(missing)
+
+    def get_tile(self, z, x, y):
+        """The tile as an RGB float array, or None if it is not in the store."""
+        from matplotlib.image import imread
+        path = self.tile_path(z, x, y)
+        if not os.path.exists(path):
+            return None
+        image = imread(path)
+        if image.dtype == np.uint8:
+            image = image / 255.0
+        if image.ndim == 2:
+            image = np.stack([image] * 3, axis=-1)
+        return image[:, :, :3]
+
+    @traced('basemap')
+    def basemap(self, lon_bounds, lat_bounds, zoom=None):
+        """Stitched lon/lat basemap raster covering the bounds, and its extent.
+
+        The raster is built once per extent and zoom, then served from memory.
+        Missing tiles are left white.
+        """
+        zoom = auto_zoom(lon_bounds, lat_bounds) if zoom is None else zoom
+        key = (tuple(lon_bounds), tuple(lat_bounds), zoom)
+        if key in self._rasters:
+            return self._rasters[key]
+
+        x0, x1, y0, y1 = tile_range(lon_bounds, lat_bounds, zoom)
+        mosaic = np.ones(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 3))
+        missing = 0
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tile = self.get_tile(zoom, x, y)
+                if tile is None:
+                    missing += 1
+                    continue
+                top, left = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+                mosaic[top:top + TILE_SIZE, left:left + TILE_SIZE] = tile[:TILE_SIZE, :TILE_SIZE]
+        if missing:
+            print(f"Basemap: {missing} tile(s) missing at zoom {zoom}, left blank "
+                  f"(see python basemap.py --prefetch).")
+
+        # Web Mercator rows are not evenly spaced in latitude: resample each
+        # output row (evenly spaced in latitude) from its Mercator row.
+        n_rows = int((tile_y(lat_bounds[0], zoom) - tile_y(lat_bounds[1], zoom)) * TILE_SIZE) + 1
+        n_cols = int((tile_x(lon_bounds[1], zoom) - tile_x(lon_bounds[0], zoom)) * TILE_SIZE) + 1
+        lats = np.linspace(lat_bounds[1], lat_bounds[0], n_rows)
+        lons = np.linspace(lon_bounds[0], lon_bounds[1], n_cols)
+        rows = ((tile_y(lats, zoom) - y0) * TILE_SIZE).astype(int).clip(0, mosaic.shape[0] - 1)
+        cols = ((tile_x(lons, zoom) - x0) * TILE_SIZE).astype(int).clip(0, mosaic.shape[1] - 1)
+        raster = (mosaic[rows[:, None], cols[None, :]], [lon_bounds[0], lon_bounds[1], lat_bounds[0], lat_bounds[1]])
+        self._rasters[key] = raster
+        return raster
+
+
+_default_store = None
+
+
+def default_tile_store():
+    """The tile store shared by every map in this process."""
+    global _default_store
+    if _default_store is None:
+        _default_store = TileStore()
+    return _default_store
+
+
+def add_basemap(ax, store=None, zoom=None):
+    """Draws the basemap under everything on ax, for the current axis limits (lon/lat)."""
+    store = store or default_tile_store()
+    lon_bounds, lat_bounds = sorted(ax.get_xlim()), sorted(ax.get_ylim())
+    image, extent = store.basemap(lon_bounds, lat_bounds, zoom)
+    ax.imshow(image, extent=extent, origin='upper', zorder=0, interpolation='bilinear')
+    ax.set_xlim(lon_bounds)
+    ax.set_ylim(lat_bounds)
+
+
+if __name__ == '__main__':
+    from regions import REGIONS
+    parser = argparse.ArgumentParser(description='Fill the local map tile store before rendering.')
+    parser.add_argument('--prefetch', nargs='*', metavar='REGION',
+                        help='download the missing tiles of these regions (default: every registered region)')
+    parser.add_argument('--seed', metavar='FOLDER', help='copy the <z>/<x>/<y>.png tiles found under FOLDER')
+    parser.add_argument('--tile-dir', default=tile_folder_path, help='the tile store')
+    parser.add_argument('--zoom', type=int, help='zoom level (default: the one the maps use)')
+    options = parser.parse_args()
+    if options.prefetch is None and options.seed is None:
+        parser.error('nothing to do: pass --prefetch and/or --seed')
+
+    store = TileStore(options.tile_dir)
+    if options.seed:
+        print(f"Seeded {store.seed(options.seed)} tile(s) from '{options.seed}'.")
+    if options.prefetch is not None:
+        for name in options.prefetch or list(REGIONS):
+            region = REGIONS[name]
+            try:
+                fetched = store.prefetch(region.lon_bounds, region.lat_bounds, options.zoom)
+            except OSError as e:
+                print(f"Error: could not download the tiles of {name} ({e}).")
+                exit()
+            print(f"{name}: {fetched} tile(s) downloaded.")
+    print(f"The tiles are in '{store.tile_dir}'.")
@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+from types import SimpleNamespace
+import matplotlib
+matplotlib.use('Agg') # Renders are timed headless
+import numpy as np
+import pandas as pd
+from loader import ANALYSIS_COLUMNS, find_csv_files, load_crime_data
+from streaming import count_crimes, unsolved_rates
+from regions import build_spatial_index, get_region, select_region
+from density import kde_grid
+from records import load_crime_records
+from query import CrimeQuery
+from synthetic import DATASET_SIZES, generate_crime_data, parse_size
+from seasonality import SeasonalityCube
+from timeindex import TimeIndex
+import analysis
+import report
+
+# Scaling benchmark on synthetic police.uk data (see synthetic.py).
+# Every dataset size is generated once (seeded) under --data-root and reused;
+# then loading, cleaning, each aggregation and each report stage (figure and
+# table) are timed and written to a JSON file, one result per size and step.
+#
+#   python benchmark.py --sizes 600k 6M --output benchmark.json
+#   python benchmark.py --sizes 600k --benchmarks load_crime_data top_crimes
+
+default_data_root = os.path.join(tempfile.gettempdir(), 'uk_crime_benchmark')
+
+
+# --- Loading and Cleaning ---
+
+def read_csv_raw(data):
+    """The original scripts' load: every column, default dtypes, one concat."""
+    data.raw_df = pd.concat([pd.read_csv(file) for file in find_csv_files(data.folder)], ignore_index=True)
+    return len(data.raw_df)
+
+
+def clean_raw(data):
+    """The original scripts' cleaning of the raw frame."""
+    if data.raw_df is None:
+        read_csv_raw(data)
+    crime_df = data.raw_df.drop(columns=['Context', 'Crime ID'], errors='ignore').dropna(subset=['Longitude', 'Latitude'])
+    crime_df['Month'] = pd.to_datetime(crime_df['Month'], format='%Y-%m')
+    data.raw_df = None
+    return len(crime_df)
+
+
+def load_typed(data):
+    """load_crime_data() straight from the CSVs (no cache)."""
+    data.crime_df = load_crime_data(data.folder, ANALYSIS_COLUMNS, cache_dir=None, workers=data.workers)
+    return len(data.crime_df)
+
+
+def cache_build(data):
+    """load_crime_data() filling an empty Parquet cache."""
+    shutil.rmtree(data.cache_dir, ignore_errors=True)
+    return len(load_crime_data(data.folder, ANALYSIS_COLUMNS, cache_dir=data.cache_dir, workers=data.workers))
+
+
+def cache_load(data):
+    """load_crime_data() from a warm Parquet cache."""
+    return len(load_crime_data(data.folder, ANALYSIS_COLUMNS, cache_dir=data.cache_dir, workers=data.workers))
+
+
+def load_records(data):
+    """load_crime_records() straight from the CSVs (compact store, no cache)."""
+    return len(load_crime_records(data.folder, cache_dir=None, workers=data.workers))
+
+
+def query_oxford(data):
+    """Oxford rows only, with the force and bounding box pushed down to the CSVs."""
+    query = CrimeQuery(data.folder, cache_dir=None, workers=data.workers)
+    return len(query.region('Oxford').select('Crime type', 'Last outcome category').collect())
+
+
+# --- Aggregations (on the shared frame) ---
+
+def top_crimes(data):
+    return len(analysis.top_crime_counts(count_crimes(data.crime_df, ['Falls within', 'Crime type'])))
+
+
+def time_index(data):
+    data.time_index = TimeIndex.from_frame(data.crime_df)
+    return len(data.time_index.keys)
+
+
+def _time_index(data):
+    if data.time_index is None:
+        time_index(data)
+    return data.time_index
+
+
+def crime_rate(data):
+    force_counts = _time_index(data).counts(by='Falls within')
+    return len(analysis.crime_rates(force_counts, years=data.time_index.years))
+
+
+def rolling_windows(data):
+    # Every 1 to 24-month window of the data, per force and crime type.
+    months = _time_index(data).months
+    windows = [(months[i], months[j]) for i in range(len(months)) for j in range(i, min(i + 24, len(months)))]
+    return data.time_index.windows(windows, by=['Falls within', 'Crime type']).size
+
+
+def seasonality(data):
+    # Every force and crime type, like the report's seasonality stage.
+    seasonality_cube = SeasonalityCube.from_frame(data.crime_df)
+    return len(seasonality_cube.table(analysis.population_data)) + len(seasonality_cube.yoy_table())
+
+
+def unsolved_rate(data):
+    crime_counts = count_crimes(data.crime_df, ['Falls within', 'Crime type', 'Last outcome category'])
+    return len(unsolved_rates(crime_counts, analysis.UNSOLVED_CATEGORY))
+
+
+def spatial_index(data):
+    data.index = build_spatial_index(data.crime_df)
+    return len(data.crime_df)
+
+
+def _spatial_index(data):
+    if data.index is None:
+        spatial_index(data)
+    return data.index
+
+
+def priority_matrix(data):
+    return len(analysis.priority_matrix(select_region(data.crime_df, 'Oxford', _spatial_index(data))))
+
+
+def theft_density(data):
+    oxford = get_region('Oxford')
+    crime_df = data.crime_df
+    theft_df = crime_df[(crime_df['Falls within'] == 'Thames Valley Police') & crime_df['Crime type'].isin(analysis.THEFT_CATEGORIES)]
+    kde_grid(theft_df['Longitude'], theft_df['Latitude'], bounds=(oxford.lon_bounds, oxford.lat_bounds))
+    return len(theft_df)
+
+
+def report_stage(stage):
+    def run(data):
+        options = SimpleNamespace(output=data.output_dir, dpi=data.dpi, region='Oxford',
+                                  index=_spatial_index(data), time_index=_time_index(data), render_workers=1,
+                                  tables_only=False)
+        return len(report.STAGES[stage](data.crime_df, options))
+    run.__name__ = f'render_{stage}'
+    return run
+
+
+# Report stages that only write tables; they are timed as 'compute', not 'render'.
+TABLE_STAGES = ['rolling-rates', 'hotspot-cells']
+
+# (name, kind, function); the steps run in this order and may reuse earlier results.
+BENCHMARKS = [
+    ('read_csv_raw', 'load', read_csv_raw),
+    ('clean_raw', 'clean', clean_raw),
+    ('load_crime_data', 'load', load_typed),
+    ('cache_build', 'load', cache_build),
+    ('cache_load', 'load', cache_load),
+    ('load_crime_records', 'load', load_records),
+    ('query_oxford', 'load', query_oxford),
+    ('top_crimes', 'aggregate', top_crimes),
+    ('time_index', 'aggregate', time_index),
+    ('crime_rate', 'aggregate', crime_rate),
+    ('rolling_windows', 'aggregate', rolling_windows),
+    ('seasonality', 'aggregate', seasonality),
+    ('unsolved_rate', 'aggregate', unsolved_rate),
+    ('spatial_index', 'aggregate', spatial_index),
+    ('priority_matrix', 'aggregate', priority_matrix),
+    ('theft_density', 'aggregate', theft_density),
+] + [(f'render_{stage}', 'compute' if stage in TABLE_STAGES else 'render', report_stage(stage))
+      for stage in report.STAGES]
+
+
+def dataset_folder(data_root, size, seed):
+    """The synthetic dataset of one size, generated on first use."""
+    folder = os.path.join(data_root, f'{size}-seed{seed}')
+    marker = os.path.join(folder, 'synthetic.json')
+    if not os.path.exists(marker):
+        print(f"Generating the {size} dataset in '{folder}'...")
+        shutil.rmtree(folder, ignore_errors=True)
+        generate_crime_data(folder, parse_size(size), seed=seed)
+        with open(marker, 'w') as f:
+            json.dump({'rows': parse_size(size), 'seed': seed}, f)
+    return folder
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+
+def run_benchmarks(sizes, names=None, data_root=default_data_root, seed=0, repeat=1, workers=1, dpi=100):
+    """Times every selected benchmark on every dataset size. Returns one dict per (size, benchmark)."""
+    names = names or [name for name, _, _ in BENCHMARKS]
+    steps = [(name, kind, function) for name, kind, function in BENCHMARKS if name in names]
+    results = []
+    for size in sizes:
+        folder = dataset_folder(data_root, size, seed)
+        data = SimpleNamespace(folder=folder, workers=workers, dpi=dpi, raw_df=None, crime_df=None, index=None, time_index=None,
+                               cache_dir=f'{folder}-cache', output_dir=os.path.join(data_root, f'{size}-seed{seed}-figures'))
+        os.makedirs(data.output_dir, exist_ok=True)
+        # Load the shared frame even when load_crime_data itself is not timed.
+        if any(kind in ('aggregate', 'compute', 'render') for _, kind, _ in steps) and 'load_crime_data' not in names:
+            load_typed(data)
+
+        print(f"\nBenchmarking the {size} dataset...")
+        for name, kind, function in steps:
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows_out = function(data)
+                seconds.append(time.perf_counter() - start)
+            results.append({'size': size, 'rows': parse_size(size), 'benchmark': name, 'kind': kind,
+                            'seconds': min(seconds), 'all_seconds': seconds, 'rows_out': int(rows_out)})
+            print(f" -> {name}: {min(seconds):.3f}s")
+        shutil.rmtree(data.cache_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time every pipeline step on synthetic data of several sizes.')
+    parser.add_argument('--sizes', nargs='+', default=['600k'], help=f"dataset sizes ({', '.join(DATASET_SIZES)} or a number)")
+    parser.add_argument('--benchmarks', nargs='+', choices=[name for name, _, _ in BENCHMARKS],
+                        help='steps to time (default: all)')
+    parser.add_argument('--data-root', default=default_data_root, help='folder for the generated datasets')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per step; the fastest is reported')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to parse the CSV files')
+    parser.add_argument('--dpi', type=int, default=100)
+    options = parser.parse_args()
+
+    results = run_benchmarks(options.sizes, options.benchmarks, options.data_root, options.seed,
+                             options.repeat, options.workers, options.dpi)
+    with open(options.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'command': sys.argv[1:],
+                   'machine': machine_info(), 'seed': options.seed, 'results': results}, f, indent=2)
+    print(f"\nProcess finished. {len(results)} results have been written to '{options.output}'.")
@@ -0,0 +1,143 @@
+import os
+import json
+import re
+import hashlib
+import pandas as pd
+from functools import partial
+from instrument import stage, traced
+from loader import CLEAN_COLUMNS, ANALYSIS_COLUMNS, find_csv_files, read_crime_csv, concat_crime_frames, map_files
+
+# On-disk Parquet cache of the cleaned street data.
+# Each source CSV is cleaned once and stored as its own Parquet file under
+# force=<force>/month=<YYYY-MM>/, named after the source file and a short
+# hash of its path (so same-named files in different folders never share a
+# cache file). The manifest records the path, size and mtime of every source
+# file, so later runs only parse new or changed CSVs.
+
+MANIFEST_NAME = 'manifest.json'
+CACHE_VERSION = 3
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-') or 'unknown'
+
+
+def _file_key(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('version') != CACHE_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def _write_manifest(cache_dir, files):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'files': files}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def _partition_path(cache_dir, file_path, df):
+    """Builds the force=/month= location of the cached copy of one source file."""
+    if len(df):
+        force = _slug(df['Falls within'].iloc[0])
+        month = df['Month'].iloc[0].strftime('%Y-%m')
+    else:
+        force, month = 'unknown', 'unknown'
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    source = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f'force={force}', f'month={month}', f'{stem}-{source}.parquet')
+
+
+def store_partition(cache_dir, file_path, df):
+    """Writes df as the force=/month= Parquet file derived from file_path."""
+    cache_file = _partition_path(cache_dir, file_path, df)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_path = cache_file + '.tmp'
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_file)
+    return cache_file
+
+
+def _cache_one(cache_dir, file_path):
+    return store_partition(cache_dir, file_path, read_crime_csv(file_path, CLEAN_COLUMNS))
+
+
+@traced('cache_sync', returns_files=True)
+def sync_with_sources(folder_path, cache_dir, build, workers=1, label='Cache', files=None):
+    """Brings a per-source-file store in cache_dir up to date with folder_path.
+
+    build(file_path) writes the derived file for one CSV and returns its path.
+    It only runs for CSVs whose size or mtime changed since the last run.
+    Entries for source files that no longer exist are removed. When files is
+    given, only those CSVs are synced and the other entries are left as they
+    are. Returns the derived files in source order.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    folder_path = os.path.abspath(folder_path)
+    all_files = _read_manifest(cache_dir)
+    if files is None:
+        sources = find_csv_files(folder_path)
+        # The cache may be shared between folders; only this folder's entries are refreshed.
+        old_files = {p: e for p, e in all_files.items() if p.startswith(folder_path + os.sep)}
+    else:
+        sources = [os.path.abspath(f) for f in files]
+        old_files = {p: all_files[p] for p in sources if p in all_files}
+    new_files = {}
+    changed = {}
+
+    for file_path in sources:
+        key = _file_key(file_path)
+        entry = old_files.get(file_path)
+        if (entry and entry['size'] == key['size'] and entry['mtime_ns'] == key['mtime_ns']
+                and os.path.exists(entry['cache_file'])):
+            new_files[file_path] = entry
+        else:
+            changed[file_path] = key
+
+    cache_files = map_files(build, changed, workers)
+    for (file_path, key), cache_file in zip(changed.items(), cache_files):
+        new_files[file_path] = dict(key, cache_file=cache_file)
+    parsed = len(changed)
+
+    other_files = {p: e for p, e in all_files.items() if p not in old_files}
+    files = dict(other_files, **new_files)
+    # A cache file is only removed once no entry of the manifest refers to it.
+    in_use = {entry['cache_file'] for entry in files.values()}
+    for entry in old_files.values():
+        if entry['cache_file'] not in in_use and os.path.exists(entry['cache_file']):
+            os.remove(entry['cache_file'])
+
+    _write_manifest(cache_dir, files)
+    print(f"{label}: {parsed} file(s) parsed, {len(new_files) - parsed} reused.")
+    return [new_files[path]['cache_file'] for path in sorted(new_files)]
+
+
+def refresh_cache(folder_path, cache_dir, workers=1, files=None):
+    """Brings the Parquet cache up to date with folder_path (or only its CSVs in files) and returns the cached files."""
+    return sync_with_sources(folder_path, cache_dir, partial(_cache_one, cache_dir), workers, files=files)
+
+
+def load_cached_crime_data(folder_path, cache_dir, columns=None, workers=1):
+    """Loads the cleaned crime data through the Parquet cache."""
+    columns = list(columns or ANALYSIS_COLUMNS)
+    cache_files = refresh_cache(folder_path, cache_dir, workers)
+    if not cache_files:
+        raise FileNotFoundError(f"No CSV files found in '{folder_path}'.")
+
+    with stage('read_parquet', files=len(cache_files)) as record:
+        crime_df = concat_crime_frames(
+            pd.read_parquet(file, columns=columns, memory_map=True) for file in cache_files
+        )
+        record.rows_out = len(crime_df)
+    return crime_df
@@ -0,0 +1,109 @@
+import os
+from functools import partial
+import pandas as pd
+from loader import (main_folder_path, cache_folder_path, load_workers, read_crime_csv, concat_crime_frames,
+                    load_crime_data, pyarrow_available)
+from streaming import unsolved_rates
+from instrument import traced
+
+# Materialized count cube over force x crime type x month x outcome x LSOA.
+# Every analysis that only needs counts (rates, unsolved rates, seasonality,
+# top crimes) can query the cube instead of scanning the raw rows.
+
+CUBE_DIMENSIONS = ['Falls within', 'Crime type', 'Month', 'Last outcome category', 'LSOA code']
+
+cube_folder_path = os.path.join(cache_folder_path, 'cube') if cache_folder_path else None
+
+
+def count_rows(crime_df):
+    """Collapses cleaned crime rows into one row per cube cell with a 'Count' column."""
+    counts = crime_df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).size()
+    counts = counts[counts > 0].rename('Count').astype('int32')
+    return counts.reset_index()
+
+
+class CrimeCube:
+    """Crime counts per (force, crime type, month, outcome, LSOA) cell."""
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, crime_df):
+        return cls(count_rows(crime_df))
+
+    def merge(self, other):
+        """Adds the counts of another cube (e.g. built from new monthly files)."""
+        cells = concat_crime_frames([self.cells, other.cells])
+        return CrimeCube(cells.groupby(CUBE_DIMENSIONS, observed=True, dropna=False)['Count'].sum()
+                         .loc[lambda c: c > 0].reset_index())
+
+    def filter(self, where=None):
+        """Keeps the cells matching where.
+
+        where maps a dimension to a single value, a list of values, or for
+        'Month' a (start, end) tuple of an inclusive month range.
+        """
+        cells = self.cells
+        for column, value in (where or {}).items():
+            if column == 'Month' and isinstance(value, tuple):
+                start, end = (pd.Timestamp(v) if v is not None else None for v in value)
+                if start is not None:
+                    cells = cells[cells['Month'] >= start]
+                if end is not None:
+                    cells = cells[cells['Month'] <= end]
+            elif isinstance(value, (list, set, pd.Index)):
+                if column == 'Month':
+                    value = pd.to_datetime(list(value))
+                cells = cells[cells[column].isin(value)]
+            else:
+                if column == 'Month':
+                    value = pd.Timestamp(value)
+                cells = cells[cells[column] == value]
+        return CrimeCube(cells)
+
+    @traced('cube_query')
+    def query(self, by=(), where=None):
+        """Total count per combination of the `by` dimensions after filtering.
+
+        With no `by` dimensions the grand total is returned as an int.
+        """
+        cells = self.filter(where).cells
+        by = list(by)
+        if not by:
+            return int(cells['Count'].sum())
+        return cells.groupby(by, observed=True, dropna=False)['Count'].sum().astype('int64')
+
+    def unsolved_rates(self, unsolved_category, by=('Falls within', 'Crime type'), where=None):
+        """Total, unsolved and unsolved rate per combination of the `by` dimensions."""
+        return unsolved_rates(self.query(list(by) + ['Last outcome category'], where), unsolved_category, by)
+
+    def save(self, path):
+        self.cells.to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_parquet(path))
+
+
+def _cube_one(cube_dir, file_path):
+    from cache import store_partition
+    return store_partition(cube_dir, file_path, count_rows(read_crime_csv(file_path, CUBE_DIMENSIONS)))
+
+
+@traced('load_crime_cube')
+def load_crime_cube(folder_path=main_folder_path, cube_dir=cube_folder_path, workers=load_workers):
+    """Builds (or incrementally refreshes) the count cube for folder_path.
+
+    Each source CSV gets its own cube partition in cube_dir, so new monthly
+    files are counted and merged in without recounting the rest. Without a
+    cube_dir (or pyarrow) the cube is built in memory from the loaded data.
+    """
+    if not cube_dir or not pyarrow_available():
+        return CrimeCube.from_frame(load_crime_data(folder_path, CUBE_DIMENSIONS, cache_dir=None, workers=workers))
+
+    from cache import sync_with_sources
+    partitions = sync_with_sources(folder_path, cube_dir, partial(_cube_one, cube_dir), workers, label='Cube')
+    if not partitions:
+        raise FileNotFoundError(f"No CSV files found in '{folder_path}'.")
+    return CrimeCube(concat_crime_frames(pd.read_parquet(p) for p in partitions))
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from instrument import traced
+from regions import build_spatial_index, get_region, select_region
+from density import _fft_convolve, _gaussian_kernel
+
+# Spatial fingerprints: where in an area each crime type (or month) happens.
+# All groups are binned onto one shared grid with a single bincount, giving a
+# (group, lat cell, lon cell) histogram. The pairwise similarity of every two
+# groups is then a couple of array operations, so every crime type of every
+# town can be compared and clustered without drawing a single map.
+
+SIMILARITY_METRICS = ['cosine', 'jensen-shannon']
+
+
+class Fingerprints:
+    """Histograms of several groups (e.g. crime types) on one lon/lat grid."""
+
+    def __init__(self, labels, histograms, lon_bounds, lat_bounds):
+        self.labels = pd.Index(labels)
+        self.histograms = histograms
+        self.lon_bounds = list(lon_bounds)
+        self.lat_bounds = list(lat_bounds)
+
+    @property
+    def counts(self):
+        return pd.Series(self.histograms.sum(axis=(1, 2)), index=self.labels, name='Count')
+
+    def smoothed(self, cells=1.0):
+        """Fingerprints blurred with a Gaussian of `cells` grid cells, so near misses still match."""
+        half = int(np.ceil(4 * cells))
+        kernel = _gaussian_kernel(half, half, 1.0, 1.0, cells, cells)
+        n_y, n_x = self.histograms.shape[1:]
+        padded = np.pad(self.histograms.astype(float), ((0, 0), (half, half), (half, half)))
+        blurred = np.stack([_fft_convolve(h, kernel)[2 * half:2 * half + n_y, 2 * half:2 * half + n_x] for h in padded])
+        return Fingerprints(self.labels, np.maximum(blurred, 0), self.lon_bounds, self.lat_bounds)
+
+    def distributions(self):
+        """Each group's histogram flattened and scaled to sum to 1, as a (groups, cells) array."""
+        flat = self.histograms.reshape(len(self.labels), -1).astype(float)
+        totals = flat.sum(axis=1, keepdims=True)
+        return np.divide(flat, totals, out=np.zeros_like(flat), where=totals > 0)
+
+    def similarity(self, metric='cosine'):
+        """Pairwise similarity of the groups as a labelled square DataFrame (1 = identical).
+
+        'cosine' compares the normalized histograms as vectors; 'jensen-shannon'
+        is 1 minus the Jensen-Shannon divergence in bits.
+        """
+        p = self.distributions()
+        if metric == 'cosine':
+            norms = np.linalg.norm(p, axis=1, keepdims=True)
+            unit = np.divide(p, norms, out=np.zeros_like(p), where=norms > 0)
+            matrix = unit @ unit.T
+        elif metric == 'jensen-shannon':
+            matrix = 1 - jensen_shannon_divergence(p)
+        else:
+            raise ValueError(f"Unknown similarity metric '{metric}'. Use one of {SIMILARITY_METRICS}.")
+        return pd.DataFrame(np.clip(matrix, 0, 1), index=self.labels, columns=self.labels)
+
+
+def _entropy(p):
+    """Entropy in bits along the last axis (0 log 0 = 0)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(p > 0, p * np.log2(p), 0.0)
+    return -terms.sum(axis=-1)
+
+
+def jensen_shannon_divergence(p, block=8):
+    """Jensen-Shannon divergence (bits) between every two rows of p.
+
+    Rows are probability distributions. Pairs are computed `block` rows at a
+    time to bound the (block, groups, cells) intermediate array.
+    """
+    entropy = _entropy(p)
+    divergence = np.empty((len(p), len(p)))
+    for start in range(0, len(p), block):
+        mixture = (p[start:start + block, None, :] + p[None, :, :]) / 2
+        divergence[start:start + block] = _entropy(mixture) - (entropy[start:start + block, None] + entropy[None, :]) / 2
+    return np.clip(divergence, 0, 1)
+
+
+@traced('build_fingerprints')
+def build_fingerprints(crime_df, by='Crime type', lon_bounds=None, lat_bounds=None, cell_size=0.005, min_count=1):
+    """Bins every group of `by` in crime_df onto one grid in a single pass.
+
+    By default the grid covers the rows' extent. Groups with fewer than
+    min_count crimes inside the grid are dropped.
+    """
+    lon = crime_df['Longitude'].to_numpy(dtype=float)
+    lat = crime_df['Latitude'].to_numpy(dtype=float)
+    if lon_bounds is None:
+        lon_bounds = [np.nanmin(lon), np.nanmax(lon)] if len(lon) else [0, 0]
+    if lat_bounds is None:
+        lat_bounds = [np.nanmin(lat), np.nanmax(lat)] if len(lat) else [0, 0]
+
+    codes, labels = pd.factorize(crime_df[by], sort=True)
+    n_x = max(int(np.ceil((lon_bounds[1] - lon_bounds[0]) / cell_size)), 1)
+    n_y = max(int(np.ceil((lat_bounds[1] - lat_bounds[0]) / cell_size)), 1)
+    ix = np.floor((lon - lon_bounds[0]) / cell_size)
+    iy = np.floor((lat - lat_bounds[0]) / cell_size)
+    # Points on the upper bounds belong to the last cell.
+    ix = np.where(lon == lon_bounds[1], n_x - 1, ix)
+    iy = np.where(lat == lat_bounds[1], n_y - 1, iy)
+    keep = (ix >= 0) & (ix < n_x) & (iy >= 0) & (iy < n_y) & (codes >= 0)
+
+    cells = (codes[keep] * n_y + iy[keep].astype(np.int64)) * n_x + ix[keep].astype(np.int64)
+    histograms = np.bincount(cells, minlength=len(labels) * n_y * n_x).reshape(len(labels), n_y, n_x)
+    enough = histograms.sum(axis=(1, 2)) >= min_count
+    return Fingerprints(np.asarray(labels)[enough], histograms[enough], lon_bounds, lat_bounds)
+
+
+def region_fingerprints(crime_df, region, by='Crime type', cell_size=0.005, min_count=1, index=None):
+    """build_fingerprints() over a named region's rows and bounding box."""
+    region = get_region(region)
+    region_df = select_region(crime_df, region, index)
+    return build_fingerprints(region_df, by, region.lon_bounds, region.lat_bounds, cell_size, min_count)
+
+
+def cluster_similarity(similarity, threshold=0.5):
+    """Groups labels by average-linkage clustering of a similarity matrix.
+
+    Clusters keep merging while their average similarity is at least
+    threshold. Returns the cluster number (0, 1, ...) of every label.
+    """
+    labels = list(similarity.index)
+    matrix = similarity.to_numpy(dtype=float)
+    clusters = [[i] for i in range(len(labels))]
+    while len(clusters) > 1:
+        best, pair = -np.inf, None
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                linkage = matrix[np.ix_(clusters[a], clusters[b])].mean()
+                if linkage > best:
+                    best, pair = linkage, (a, b)
+        if best < threshold:
+            break
+        a, b = pair
+        clusters[a] = clusters[a] + clusters.pop(b)
+
+    clusters.sort(key=lambda members: (-len(members), min(members)))
+    assignment = {labels[i]: number for number, members in enumerate(clusters) for i in members}
+    return pd.Series(assignment, name='Cluster').loc[labels]
+
+
+def town_similarities(crime_df, regions, by='Crime type', metric='cosine', cell_size=0.005, min_count=20,
+                      smooth=1.0):
+    """Similarity matrix of the `by` groups in every region, sharing one spatial index.
+
+    Returns {region name: similarity DataFrame}.
+    """
+    index = build_spatial_index(crime_df)
+    similarities = {}
+    for region in regions:
+        fingerprints = region_fingerprints(crime_df, region, by, cell_size, min_count, index)
+        if smooth:
+            fingerprints = fingerprints.smoothed(smooth)
+        similarities[get_region(region).name] = fingerprints.similarity(metric)
+    return similarities
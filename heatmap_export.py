@@ -0,0 +1,174 @@
+import os
+import json
+import shutil
+import numpy as np
+from basemap import TILE_SIZE, tile_x, tile_y
+from instrument import traced
+
+# Interactive heatmap export with a tile pyramid of pre-aggregated cells.
+# Instead of inlining every incident in the page (as folium's HeatMap does),
+# the incidents are counted into screen-sized cells for each zoom level and
+# written as one small static file per map tile next to the HTML. The page
+# only loads the tiles in view at the current zoom, so a tile never holds
+# more than (256 / cell_px)^2 cells and the page cost does not grow with the
+# number of incidents.
+
+LEAFLET_JS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js'
+LEAFLET_CSS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css'
+LEAFLET_HEAT_JS = 'https://cdn.jsdelivr.net/npm/leaflet.heat@0.2.0/dist/leaflet-heat.js'
+
+# Deepest zoom with its own cells; closer zooms reuse them. Around street level
+# an 8px cell is a few metres, so deeper levels would barely aggregate.
+MAX_CELL_ZOOM = 15
+
+
+def aggregate_cells(lon, lat, zoom, cell_px=8):
+    """Counts points per cell_px-pixel cell at one zoom level.
+
+    Returns the mean latitude and longitude of the points in each occupied
+    cell and the number of points in it.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    cells_per_row = TILE_SIZE * 2 ** zoom // cell_px
+    cx = (tile_x(lon, zoom) * TILE_SIZE // cell_px).astype(np.int64)
+    cy = (tile_y(lat, zoom) * TILE_SIZE // cell_px).astype(np.int64)
+    cells, inverse = np.unique(cy * cells_per_row + cx, return_inverse=True)
+    counts = np.bincount(inverse)
+    mean_lat = np.bincount(inverse, weights=lat) / counts
+    mean_lon = np.bincount(inverse, weights=lon) / counts
+    return mean_lat, mean_lon, counts
+
+
+def _write_tiles(cells_path, zoom, mean_lat, mean_lon, counts):
+    """Writes one <zoom>/<x>/<y>.js file per map tile holding occupied cells."""
+    tx = tile_x(mean_lon, zoom).astype(np.int64)
+    ty = tile_y(mean_lat, zoom).astype(np.int64)
+    order = np.lexsort((ty, tx))
+    tiles, starts = np.unique(np.column_stack([tx[order], ty[order]]), axis=0, return_index=True)
+    ends = np.append(starts[1:], len(order))
+    for (x, y), start, end in zip(tiles, starts, ends):
+        rows = order[start:end]
+        # Flat [lat, lon, count, lat, lon, count, ...] keeps the files small; 5 decimals is about 1m.
+        flat = ','.join(f'{la:.5f},{lo:.5f},{c}' for la, lo, c in zip(mean_lat[rows], mean_lon[rows], counts[rows]))
+        tile_dir = os.path.join(cells_path, str(zoom), str(x))
+        os.makedirs(tile_dir, exist_ok=True)
+        with open(os.path.join(tile_dir, f'{y}.js'), 'w') as f:
+            f.write(f"HEAT_TILES.load('{zoom}/{x}/{y}',[{flat}]);\n")
+    return len(tiles)
+
+
+_PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>{title}</title>
+    <link rel="stylesheet" href="{leaflet_css}"/>
+    <script src="{leaflet_js}"></script>
+    <script src="{leaflet_heat_js}"></script>
+    <style>html, body, #map {{ width: 100%; height: 100%; margin: 0; padding: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+    var map = L.map("map", {{center: {center}, zoom: {zoom}, minZoom: {min_zoom}}});
+    L.tileLayer("https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+        maxZoom: 19,
+        attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+    }}).addTo(map);
+    var heat = L.heatLayer([], {{minOpacity: 0.5, maxZoom: 18, radius: {radius}, blur: {blur}}}).addTo(map);
+
+    // Every tile of the pyramid is a script {cells_dir}/<z>/<x>/<y>.js that calls
+    // HEAT_TILES.load(); script tags (unlike fetch) also work from disk.
+    var HEAT_TILES = {{
+        minZoom: {min_zoom}, maxZoom: {max_zoom}, maxCounts: {max_counts},
+        points: {{}}, requested: {{}},
+        level: function () {{ return Math.max(this.minZoom, Math.min(this.maxZoom, map.getZoom())); }},
+        visible: function (zoom) {{
+            var bounds = map.getBounds(), keys = [];
+            var nw = map.project(bounds.getNorthWest(), zoom).divideBy(256).floor();
+            var se = map.project(bounds.getSouthEast(), zoom).divideBy(256).floor();
+            for (var x = nw.x; x <= se.x; x++) {{
+                for (var y = nw.y; y <= se.y; y++) {{ keys.push(zoom + "/" + x + "/" + y); }}
+            }}
+            return keys;
+        }},
+        load: function (key, flat) {{
+            var points = [];
+            for (var i = 0; i < flat.length; i += 3) {{ points.push([flat[i], flat[i + 1], flat[i + 2]]); }}
+            this.points[key] = points;
+            this.redraw();
+        }},
+        redraw: function () {{
+            var zoom = this.level(), keys = this.visible(zoom), points = [];
+            for (var i = 0; i < keys.length; i++) {{
+                if (this.points[keys[i]]) {{ points = points.concat(this.points[keys[i]]); }}
+            }}
+            heat.setOptions({{max: this.maxCounts[zoom]}});
+            heat.setLatLngs(points);
+        }},
+        show: function () {{
+            var keys = this.visible(this.level());
+            for (var i = 0; i < keys.length; i++) {{
+                if (this.requested[keys[i]]) {{ continue; }}
+                this.requested[keys[i]] = true;
+                var script = document.createElement("script");
+                script.src = "{cells_dir}/" + keys[i] + ".js";  // tiles without crimes don't exist
+                script.onerror = function () {{ this.remove(); }};
+                document.body.appendChild(script);
+            }}
+            this.redraw();
+        }}
+    }};
+    map.on("moveend", function () {{ HEAT_TILES.show(); }});
+    HEAT_TILES.show();
+</script>
+</body>
+</html>
+'''
+
+
+@traced('export_heatmap')
+def export_heatmap(lon, lat, output_html, title='Crime Hotspots', center=None, zoom=14,
+                   min_zoom=8, max_zoom=MAX_CELL_ZOOM, cell_px=8, radius=15, blur=15):
+    """Writes an interactive heatmap page plus its pyramid of pre-aggregated cell tiles.
+
+    The tiles go in a '<page name>_cells' folder next to output_html. Zooms
+    past max_zoom (at most MAX_CELL_ZOOM) show the cells of max_zoom.
+    Returns the number of tiles written for each zoom level.
+    """
+    max_zoom = min(max_zoom, MAX_CELL_ZOOM)
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    if center is None:
+        center = [round(float(np.median(lat)), 5), round(float(np.median(lon)), 5)]
+
+    stem = os.path.splitext(os.path.basename(output_html))[0]
+    cells_dir = f'{stem}_cells'
+    cells_path = os.path.join(os.path.dirname(os.path.abspath(output_html)), cells_dir)
+    # Tiles of an earlier export would still be loaded by the page.
+    shutil.rmtree(cells_path, ignore_errors=True)
+    os.makedirs(cells_path)
+
+    tile_counts = {}
+    max_counts = {}
+    for level in range(min_zoom, max_zoom + 1):
+        mean_lat, mean_lon, counts = aggregate_cells(lon, lat, level, cell_px)
+        tile_counts[level] = _write_tiles(cells_path, level, mean_lat, mean_lon, counts)
+        max_counts[level] = int(counts.max(initial=1))
+
+    with open(output_html, 'w') as f:
+        f.write(_PAGE.format(
+            title=title, leaflet_css=LEAFLET_CSS, leaflet_js=LEAFLET_JS, leaflet_heat_js=LEAFLET_HEAT_JS,
+            center=json.dumps(center), zoom=zoom, radius=radius, blur=blur,
+            cells_dir=cells_dir, min_zoom=min_zoom, max_zoom=max_zoom, max_counts=json.dumps(max_counts),
+        ))
+    return tile_counts
+
+
+def export_crime_heatmap(crime_df, crime_type, output_html, **options):
+    """export_heatmap() for every crime of one type in crime_df (e.g. a region's rows)."""
+    crime_specific_df = crime_df[crime_df['Crime type'] == crime_type]
+    return export_heatmap(crime_specific_df['Longitude'], crime_specific_df['Latitude'], output_html,
+                          title=f'{crime_type} Hotspots', **options)
@@ -0,0 +1,260 @@
+import math
+import numpy as np
+import pandas as pd
+from instrument import traced
+
+# Statistical hotspot detection with the Getis-Ord Gi* statistic.
+# The study area is split into units: square grid cells of a fixed size in
+# metres, or areas such as LSOAs (placed at the mean position of their
+# crimes). The neighbours of every unit within a distance band are found once
+# with a grid hash and kept as a sparse (CSR) index, so Gi* for any number of
+# crime types or months is a few array operations on a (units, groups) count
+# matrix. Significant hot cells that touch are grouped into hotspots.
+
+# Metres per degree of latitude, and of longitude at the equator.
+METRES_PER_DEGREE_LAT = 110540.0
+METRES_PER_DEGREE_LON = 111320.0
+# Reference latitude of the local projection, so cell IDs are stable across runs.
+REFERENCE_LATITUDE = 52.0
+
+HOT_SPOT = 'Hot spot'
+COLD_SPOT = 'Cold spot'
+NOT_SIGNIFICANT = 'Not significant'
+
+
+def to_metres(lon, lat, reference_latitude=REFERENCE_LATITUDE):
+    """Equirectangular x/y in metres; accurate enough for distances within a force area."""
+    x = np.asarray(lon, dtype=float) * METRES_PER_DEGREE_LON * math.cos(math.radians(reference_latitude))
+    y = np.asarray(lat, dtype=float) * METRES_PER_DEGREE_LAT
+    return x, y
+
+
+class NeighborIndex:
+    """Neighbours of every point within a distance band (itself included), as CSR arrays."""
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_points(cls, x, y, distance):
+        """Finds every pair of points at most `distance` apart.
+
+        Points are hashed into buckets of side `distance`, so only the 3x3
+        buckets around each point are compared.
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        n = len(x)
+        bx = np.floor(x / distance).astype(np.int64)
+        by = np.floor(y / distance).astype(np.int64)
+        by_range = by.max() - by.min() + 3 if n else 1
+        keys = (bx - bx.min() + 1) * by_range + (by - by.min() + 1) if n else bx
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        rows, cols = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                target = keys + dx * by_range + dy
+                starts = np.searchsorted(sorted_keys, target, side='left')
+                ends = np.searchsorted(sorted_keys, target, side='right')
+                lengths = ends - starts
+                # Expand every point's [start, end) range of candidates.
+                row = np.repeat(np.arange(n), lengths)
+                offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                col = order[np.repeat(starts, lengths) + offsets]
+                close = (x[row] - x[col]) ** 2 + (y[row] - y[col]) ** 2 <= distance ** 2
+                rows.append(row[close])
+                cols.append(col[close])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(indptr, cols[order])
+
+    @property
+    def neighbor_counts(self):
+        return np.diff(self.indptr)
+
+    def sums(self, values):
+        """Sum of the values of every point's neighbours; values is (points,) or (points, groups)."""
+        values = np.asarray(values, dtype=float)
+        if not len(self):
+            return np.zeros(values.shape)
+        # Every point is its own neighbour, so no row of the CSR index is empty.
+        return np.add.reduceat(values[self.indices], self.indptr[:-1], axis=0)
+
+    def components(self, mask):
+        """Connected groups of the masked points: a group number per point, -1 outside the mask."""
+        rows = np.repeat(np.arange(len(self)), self.neighbor_counts)
+        both = mask[rows] & mask[self.indices]
+        a, b = rows[both], self.indices[both]
+        labels = np.where(mask, np.arange(len(self)), -1)
+        while True:
+            # Every point takes the smallest label among its neighbours until nothing changes.
+            updated = labels.copy()
+            np.minimum.at(updated, a, labels[b])
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        _, numbered = np.unique(labels[mask], return_inverse=True)
+        groups = np.full(len(self), -1)
+        groups[mask] = numbered
+        return groups
+
+
+class HotspotIndex:
+    """The units of a study area and their neighbour index, reusable across crime types and months."""
+
+    def __init__(self, units, lon, lat, distance, cell_size=None, column=None):
+        self.units = pd.Index(units)
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.distance = distance
+        self.cell_size = cell_size
+        self.column = column
+        self.cell_keys = None
+        self.neighbors = NeighborIndex.from_points(*to_metres(self.lon, self.lat), distance)
+
+    @staticmethod
+    def _cell_steps(cell_size):
+        return (cell_size / (METRES_PER_DEGREE_LON * math.cos(math.radians(REFERENCE_LATITUDE))),
+                cell_size / METRES_PER_DEGREE_LAT)
+
+    @classmethod
+    def _cell_keys(cls, lon, lat, cell_size):
+        """One int64 key per grid cell: column in the high 32 bits, row in the low ones."""
+        step_lon, step_lat = cls._cell_steps(cell_size)
+        ix = np.floor(np.asarray(lon, dtype=float) / step_lon).astype(np.int64)
+        iy = np.floor(np.asarray(lat, dtype=float) / step_lat).astype(np.int64)
+        return (ix << 32) + (iy + 2 ** 31)
+
+    @classmethod
+    def from_grid(cls, lon, lat, cell_size=250, distance=None):
+        """Grid cells of cell_size metres holding at least one of the given points.
+
+        The points define the study area (e.g. every crime of a force), so
+        cells without any crime at all are not counted as zeros. By default
+        the neighbours are the 8 surrounding cells.
+        """
+        distance = distance or cell_size * 1.5
+        keys = np.unique(cls._cell_keys(lon, lat, cell_size))
+        ix, iy = keys >> 32, (keys & 0xFFFFFFFF) - 2 ** 31
+        step_lon, step_lat = cls._cell_steps(cell_size)
+        ids = [f'{cell_size}m_{x}_{y}' for x, y in zip(ix, iy)]
+        index = cls(ids, (ix + 0.5) * step_lon, (iy + 0.5) * step_lat, distance, cell_size=cell_size)
+        index.cell_keys = keys
+        return index
+
+    @classmethod
+    def from_areas(cls, crime_df, column='LSOA code', distance=1000):
+        """Areas (e.g. LSOAs) placed at the mean position of their crimes."""
+        centres = crime_df.groupby(column, observed=True)[['Longitude', 'Latitude']].mean()
+        return cls(centres.index.astype(str), centres['Longitude'], centres['Latitude'], distance, column=column)
+
+    def unit_positions(self, crime_df):
+        """Position of every row's unit in self.units (-1 outside the study area)."""
+        if self.column is not None:
+            return self.units.get_indexer(crime_df[self.column].astype(str))
+        keys = self._cell_keys(crime_df['Longitude'], crime_df['Latitude'], self.cell_size)
+        positions = np.searchsorted(self.cell_keys, keys).clip(0, max(len(self.cell_keys) - 1, 0))
+        found = self.cell_keys[positions] == keys if len(self.cell_keys) else np.zeros(len(keys), dtype=bool)
+        return np.where(found, positions, -1)
+
+    def cell_bounds(self):
+        """Longitude/latitude bounds of every grid cell, to draw or export hotspots as squares."""
+        step_lon, step_lat = self._cell_steps(self.cell_size)
+        return pd.DataFrame({
+            'lon_min': self.lon - step_lon / 2, 'lon_max': self.lon + step_lon / 2,
+            'lat_min': self.lat - step_lat / 2, 'lat_max': self.lat + step_lat / 2,
+        }, index=self.units)
+
+    def counts(self, crime_df, by=None):
+        """(units, groups) count matrix of crime_df's rows, and the group labels."""
+        positions = self.unit_positions(crime_df)
+        if by is None:
+            codes, labels = np.zeros(len(crime_df), dtype=np.int64), pd.Index(['All crimes'])
+        else:
+            codes, labels = pd.factorize(crime_df[by], sort=True)
+        keep = (positions >= 0) & (codes >= 0)
+        flat = np.bincount(positions[keep] * len(labels) + codes[keep], minlength=len(self.units) * len(labels))
+        return flat.reshape(len(self.units), len(labels)), pd.Index(labels)
+
+    def gi_star(self, counts):
+        """Getis-Ord Gi* z-scores of a (units,) or (units, groups) count array (binary weights)."""
+        counts = np.asarray(counts, dtype=float)
+        n = len(self.units)
+        weights = self.neighbors.neighbor_counts.astype(float)
+        if counts.ndim == 2:
+            weights = weights[:, None]
+        mean = counts.mean(axis=0)
+        spread = np.sqrt(np.maximum((counts ** 2).mean(axis=0) - mean ** 2, 0))
+        numerator = self.neighbors.sums(counts) - mean * weights
+        denominator = spread * np.sqrt(np.maximum((n * weights - weights ** 2) / max(n - 1, 1), 0))
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def p_values(z):
+    """Two-sided p-values of z-scores."""
+    return np.vectorize(math.erfc)(np.abs(z) / math.sqrt(2)) if np.size(z) else np.asarray(z, dtype=float)
+
+
+def significant(p, alpha=0.05, fdr=True):
+    """p < alpha, with the Benjamini-Hochberg false discovery rate correction by default."""
+    p = np.asarray(p, dtype=float)
+    if not fdr or not p.size:
+        return p < alpha
+    ranked = np.sort(p)
+    passing = ranked <= alpha * np.arange(1, p.size + 1) / p.size
+    if not passing.any():
+        return np.zeros(p.shape, dtype=bool)
+    return p <= ranked[np.nonzero(passing)[0].max()]
+
+
+@traced('detect_hotspots')
+def detect_hotspots(crime_df, index, by=None, alpha=0.05, fdr=True):
+    """Gi* hot and cold spots of crime_df's rows on the units of index.
+
+    With `by` (e.g. 'Crime type' or 'Month') every group is tested on the
+    same units in one pass. Returns one row per unit and group with its count,
+    z-score, p-value, label and hotspot number ('Cluster', -1 if not hot);
+    touching hot units share a cluster.
+    """
+    counts, labels = index.counts(crime_df, by)
+    z = index.gi_star(counts)
+    tables = []
+    for g, label in enumerate(labels):
+        p = p_values(z[:, g])
+        is_significant = significant(p, alpha, fdr)
+        hot = is_significant & (z[:, g] > 0)
+        table = pd.DataFrame({
+            'Unit': index.units,
+            'Longitude': index.lon,
+            'Latitude': index.lat,
+            'Count': counts[:, g],
+            'Gi* z': z[:, g],
+            'p-value': p,
+            'Hotspot': np.where(hot, HOT_SPOT, np.where(is_significant, COLD_SPOT, NOT_SIGNIFICANT)),
+            'Cluster': index.neighbors.components(hot),
+        })
+        if by is not None:
+            table.insert(0, by, label)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def hotspot_clusters(hotspots, by=None):
+    """One row per hotspot (cluster of touching hot units): cells, crimes, extent and peak z-score."""
+    hot = hotspots[hotspots['Cluster'] >= 0]
+    keys = ([by] if by else []) + ['Cluster']
+    return hot.groupby(keys).agg(
+        Units=('Unit', 'size'),
+        Crimes=('Count', 'sum'),
+        lon_min=('Longitude', 'min'), lon_max=('Longitude', 'max'),
+        lat_min=('Latitude', 'min'), lat_max=('Latitude', 'max'),
+        peak_z=('Gi* z', 'max'),
+    ).reset_index().sort_values(keys[:-1] + ['Crimes'], ascending=[True] * (len(keys) - 1) + [False])
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import functools
+import multiprocessing
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-stage instrumentation of the pipeline.
+# Every instrumented stage records its wall time, CPU time, peak RSS and the
+# rows going in and out (and the files read, for stages that read files). Nothing is recorded unless tracing is switched on:
+#
+#   CRIME_TRACE=trace.json python report.py        (or report.py --trace trace.json)
+#   CRIME_PROFILE=kde_grid python report.py        (or report.py --profile kde_grid)
+#
+# The trace is written as JSON when the process exits. CRIME_PROFILE also
+# cProfiles every call of the named stage into <stage>.prof (next to the
+# trace), which can be read with `python -m pstats kde_grid.prof`.
+
+trace_path = os.environ.get('CRIME_TRACE') or None
+profile_stage = os.environ.get('CRIME_PROFILE') or None
+
+_records = []
+_stack = []
+_profiler = None
+_start = time.perf_counter()
+_exit_registered = False
+
+
+class StageRecord:
+    """Measurements of one run of a stage. Set rows_out inside the `with` block."""
+
+    def __init__(self, name, rows_in=None, parent=None, depth=0, files=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.files = files
+        self.rows_out = None
+        self.parent = parent
+        self.depth = depth
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def tracing_enabled():
+    return trace_path is not None or profile_stage is not None
+
+
+def enable_tracing(path=None, profile=None):
+    """Switches tracing on from code (e.g. a --trace flag), like CRIME_TRACE/CRIME_PROFILE do."""
+    global trace_path, profile_stage
+    trace_path = path or trace_path
+    profile_stage = profile or profile_stage
+    _register_exit()
+
+
+def _register_exit():
+    global _exit_registered
+    if tracing_enabled() and not _exit_registered:
+        atexit.register(write_trace)
+        _exit_registered = True
+
+
+def peak_rss_mb():
+    """Highest resident memory of this process so far, in MB (None where unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (Linux only, None elsewhere)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cpu_seconds():
+    # Children count once they have been waited for, e.g. a finished process pool.
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _length(value):
+    if isinstance(value, (str, bytes)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+@contextmanager
+def stage(name, rows_in=None, files=None):
+    """Measures the enclosed block as one run of the stage `name`.
+
+    Yields a StageRecord; assign record.rows_out to report the rows produced.
+    `files` is the number of files the stage reads, kept apart from the rows.
+    When tracing is off this only costs the creation of the record.
+    """
+    record = StageRecord(name, rows_in, _stack[-1].name if _stack else None, len(_stack), files)
+    if not tracing_enabled():
+        yield record
+        return
+
+    global _profiler
+    profiling = name == profile_stage and not any(r.name == name for r in _stack)
+    if profiling:
+        _profiler = _profiler or cProfile.Profile()
+        _profiler.enable()
+
+    _stack.append(record)
+    peak_before = peak_rss_mb()
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.wall_seconds = time.perf_counter() - wall_start
+        record.cpu_seconds = _cpu_seconds() - cpu_start
+        record.start_seconds = wall_start - _start
+        record.peak_rss_mb = peak_rss_mb()
+        record.peak_rss_growth_mb = None if peak_before is None else record.peak_rss_mb - peak_before
+        record.rss_mb = rss_mb()
+        _stack.pop()
+        if profiling:
+            _profiler.disable()
+        if trace_path is not None:
+            _records.append(record)
+
+
+def traced(name, returns_files=False):
+    """Decorator running every call of a function as the stage `name`.
+
+    rows_in is the length of the first argument and rows_out the length of
+    the result, where they have one. With returns_files the result is a list
+    of files and its length is recorded as files instead.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracing_enabled():
+                return function(*args, **kwargs)
+            with stage(name, _length(args[0]) if args else None) as record:
+                result = function(*args, **kwargs)
+                if returns_files:
+                    record.files = _length(result)
+                else:
+                    record.rows_out = _length(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def trace_records():
+    """Every stage recorded so far, in the order the stages finished."""
+    return [record.as_dict() for record in _records]
+
+
+def write_trace(path=None):
+    """Writes the JSON trace (and the cProfile dump, if any). Returns the trace path."""
+    # Pool workers inherit the settings but only the parent writes the trace.
+    if multiprocessing.parent_process() is not None:
+        return None
+    path = path or trace_path
+    if _profiler is not None:
+        profile_path = os.path.join(os.path.dirname(os.path.abspath(path)) if path else '.', f'{profile_stage}.prof')
+        _profiler.dump_stats(profile_path)
+        print(f"Trace: profile of stage '{profile_stage}' written to '{profile_path}'.")
+    if path is None:
+        return None
+    with open(path, 'w') as f:
+        json.dump({'command': sys.argv, 'pid': os.getpid(), 'peak_rss_mb': peak_rss_mb(),
+                   'wall_seconds': time.perf_counter() - _start, 'stages': trace_records()}, f, indent=1)
+    print(f"Trace: {len(_records)} stage(s) written to '{path}'.")
+    return path
+
+
+_register_exit()
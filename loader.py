@@ -0,0 +1,209 @@
+import os
+from functools import partial
+import numpy as np
+import pandas as pd
+from instrument import stage, traced
+
+# Shared loader for the police.uk street-level crime CSVs.
+# Every analysis script imports load_crime_data() instead of repeating the
+# os.walk / read_csv / concat / clean block.
+
+main_folder_path = '/Users/nirajmutha/Downloads/Crime'
+# Cleaned Parquet copies of the CSVs (see cache.py). Set to None to disable.
+cache_folder_path = os.environ.get('CRIME_CACHE_DIR', os.path.expanduser('~/.cache/uk_crime'))
+# Processes used to parse CSVs. Scripts that raise this must guard their code
+# with `if __name__ == '__main__':` so the pool can re-import them safely.
+load_workers = int(os.environ.get('CRIME_LOAD_WORKERS', '1'))
+
+# Columns the analyses actually use. 'Context' is never read; 'Crime ID' only
+# to join the outcomes files (see tables.py).
+ANALYSIS_COLUMNS = [
+    'Month', 'Falls within', 'Longitude', 'Latitude',
+    'LSOA code', 'LSOA name', 'Crime type', 'Last outcome category'
+]
+
+# Every column of a street file except 'Context', which is always empty.
+CLEAN_COLUMNS = [
+    'Crime ID', 'Month', 'Reported by', 'Falls within', 'Longitude', 'Latitude', 'Location',
+    'LSOA code', 'LSOA name', 'Crime type', 'Last outcome category'
+]
+
+# The 14 crime types police.uk reports.
+CRIME_TYPES = [
+    'Anti-social behaviour', 'Bicycle theft', 'Burglary', 'Criminal damage and arson',
+    'Drugs', 'Other crime', 'Other theft', 'Possession of weapons', 'Public order',
+    'Robbery', 'Shoplifting', 'Theft from the person', 'Vehicle crime',
+    'Violence and sexual offences'
+]
+
+# Explicit dtypes so pandas never builds object columns for the repeated labels.
+CRIME_DTYPES = {
+    'Reported by': 'category',
+    'Falls within': 'category',
+    'Longitude': 'float32',
+    'Latitude': 'float32',
+    'Location': 'category',
+    'LSOA code': 'category',
+    'LSOA name': 'category',
+    'Crime type': 'category',
+    'Last outcome category': 'category',
+}
+
+# police.uk downloads mix three kinds of CSV. Each is recognised by its file
+# name suffix, or failing that by a column only its header has.
+FILE_SCHEMAS = {
+    'street': ('-street.csv', 'Crime type'),
+    'outcomes': ('-outcomes.csv', 'Outcome type'),
+    'stop-and-search': ('-stop-and-search.csv', 'Object of search'),
+}
+
+
+def file_schema(file_path):
+    """'street', 'outcomes' or 'stop-and-search' for a police.uk CSV, or None if unknown."""
+    name = os.path.basename(file_path).lower()
+    for schema, (suffix, _) in FILE_SCHEMAS.items():
+        if name.endswith(suffix):
+            return schema
+    with open(file_path, encoding='utf-8-sig', errors='replace') as f:
+        header = [column.strip().strip('"') for column in f.readline().split(',')]
+    for schema, (_, column) in FILE_SCHEMAS.items():
+        if column in header:
+            return schema
+    return None
+
+
+def find_csv_files(folder_path=main_folder_path, schema='street'):
+    """Returns the CSV files of one schema under folder_path, sorted for a stable row order.
+
+    Only street files by default, so outcomes and stop-and-search files are
+    never mixed into crime_df. schema=None returns every CSV.
+    """
+    if not os.path.isdir(folder_path):
+        raise FileNotFoundError(f"Directory not found at '{folder_path}'.")
+
+    all_csv_files = []
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if file.endswith('.csv'):
+                all_csv_files.append(os.path.join(root, file))
+    if schema is not None:
+        all_csv_files = [file for file in all_csv_files if file_schema(file) == schema]
+    return sorted(all_csv_files)
+
+
+def read_crime_csv(file_path, columns=None, coordinate_dtype='float32'):
+    """Reads and cleans a single street CSV using only the requested columns.
+
+    coordinate_dtype='float64' keeps the 6 published decimals exactly.
+    """
+    columns = list(columns or ANALYSIS_COLUMNS)
+    # Coordinates are always needed to drop unmapped crimes.
+    read_columns = columns + [c for c in ('Longitude', 'Latitude') if c not in columns]
+    dtypes = dict(CRIME_DTYPES, Longitude=coordinate_dtype, Latitude=coordinate_dtype)
+
+    df = pd.read_csv(
+        file_path,
+        usecols=lambda c: c in read_columns,
+        dtype={c: t for c, t in dtypes.items() if c in read_columns},
+        parse_dates=['Month'] if 'Month' in read_columns else False,
+        date_format='%Y-%m',
+    )
+    df = df.dropna(subset=['Longitude', 'Latitude'])
+    return df[[c for c in columns if c in df.columns]]
+
+
+def frame_to_buffers(df):
+    """Splits a cleaned frame into plain NumPy arrays.
+
+    Categorical columns become a (codes, labels) pair, so only small integer
+    arrays and the distinct labels cross a process boundary.
+    """
+    buffers = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            buffers[column] = (values.cat.codes.to_numpy(), np.asarray(values.cat.categories, dtype=object))
+        else:
+            buffers[column] = values.to_numpy()
+    return buffers
+
+
+def concat_crime_buffers(buffers_list):
+    """Builds one DataFrame from per-file buffers with one concatenation per column.
+
+    Category labels are unified across files and each file's codes remapped,
+    so categorical columns stay categorical instead of falling back to object.
+    """
+    buffers_list = [b for b in buffers_list if b]
+    if not buffers_list:
+        return pd.DataFrame(columns=ANALYSIS_COLUMNS)
+
+    data = {}
+    for column in buffers_list[0]:
+        parts = [b[column] for b in buffers_list]
+        if isinstance(parts[0], tuple):
+            categories = pd.Index(np.concatenate([labels for _, labels in parts])).unique()
+            remapped = []
+            for codes, labels in parts:
+                # The trailing -1 keeps missing values (code -1) missing.
+                mapping = np.append(categories.get_indexer(labels), -1)
+                remapped.append(mapping[codes])
+            data[column] = pd.Categorical.from_codes(np.concatenate(remapped), categories)
+        else:
+            data[column] = np.concatenate(parts)
+    return pd.DataFrame(data)
+
+
+def concat_crime_frames(frames):
+    """Concatenates cleaned frames, keeping categorical columns categorical."""
+    return concat_crime_buffers([frame_to_buffers(f) for f in frames if len(f.columns)])
+
+
+def _read_crime_buffers(columns, file_path):
+    return frame_to_buffers(read_crime_csv(file_path, columns))
+
+
+def map_files(function, files, workers=1):
+    """Applies function to every file, fanning out to a process pool when workers > 1."""
+    files = list(files)
+    if workers > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        workers = min(workers, len(files))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, files, chunksize=max(1, len(files) // (workers * 4))))
+    return [function(file) for file in files]
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@traced('load_crime_data')
+def load_crime_data(folder_path=main_folder_path, columns=None, cache_dir=cache_folder_path,
+                    workers=load_workers):
+    """Loads and cleans every street CSV under folder_path into one DataFrame.
+
+    When cache_dir is set (and pyarrow is installed) the cleaned data is kept
+    as Parquet there, and only new or changed CSVs are parsed. With workers > 1
+    the CSVs are parsed on a process pool.
+    """
+    columns = list(columns or ANALYSIS_COLUMNS)
+    if cache_dir and set(columns) <= set(CLEAN_COLUMNS) and pyarrow_available():
+        from cache import load_cached_crime_data
+        return load_cached_crime_data(folder_path, cache_dir, columns, workers)
+
+    all_csv_files = find_csv_files(folder_path)
+    if not all_csv_files:
+        raise FileNotFoundError(f"No CSV files found in '{folder_path}'.")
+
+    with stage('parse_csv', files=len(all_csv_files)) as record:
+        buffers_list = map_files(partial(_read_crime_buffers, columns), all_csv_files, workers)
+        record.rows_out = sum(len(next(iter(b.values()))) for b in buffers_list if b)
+    with stage('concat', record.rows_out, files=len(buffers_list)) as record:
+        crime_df = concat_crime_buffers(buffers_list)
+        record.rows_out = len(crime_df)
+    return crime_df
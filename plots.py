@@ -0,0 +1,209 @@
+import os
+from regions import get_region
+from density import plot_density
+from basemap import add_basemap
+from analysis import region_density
+
+# The charts of every analysis. Each function takes the table computed in
+# analysis.py and returns the matplotlib figure, so callers can either show
+# it or save it. pyplot and seaborn are only imported when the first chart is
+# drawn, so importing this module (or analysis.py) stays cheap.
+
+# Set CRIME_COMPUTE_ONLY=1 to skip every chart: the scripts print or save
+# their tables instead and never import the plotting libraries.
+compute_only = os.environ.get('CRIME_COMPUTE_ONLY') == '1'
+
+
+def _plotting():
+    """pyplot and seaborn, imported on first use."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def show():
+    """Shows the open figures (plt.show())."""
+    plt, _ = _plotting()
+    plt.show()
+
+
+# The key crimes compared in the unsolved-rate chart.
+KEY_CRIMES = [
+    'Violence and sexual offences',
+    'Bicycle theft',
+    'Shoplifting',
+    'Burglary'
+]
+
+
+def plot_top_crimes(plot_df, period_label=None):
+    """Grouped bar chart of the top crime types for each police force.
+
+    period_label names the months counted, e.g. TimeIndex.period_label().
+    """
+    plt, sns = _plotting()
+    fig = plt.figure(figsize=(14, 10)) # Adjusted figure size for clarity
+    sns.set_style("whitegrid")
+
+    # Create a bar plot of the counts, grouped by police force
+    sns.barplot(
+        data=plot_df,
+        x='Count',
+        y='Crime type',
+        hue='Falls within',
+        palette='viridis',
+        order=plot_df.groupby('Crime type')['Count'].sum().sort_values(ascending=False).index # Order bars by overall frequency
+    )
+
+    # Set title and labels
+    plt.title('Comparison of Top Crime Types Across Police Forces', fontsize=16, weight='bold')
+    plt.xlabel(f'Total Crime Count ({period_label})' if period_label else 'Total Crime Count', fontsize=12)
+    plt.ylabel('Crime Type', fontsize=12)
+    plt.legend(title='Police Force')
+
+    plt.tight_layout()
+    return fig
+
+
+def plot_crime_rates(crime_counts):
+    """Bar chart of the average annual crime rate per 1,000 people of each force."""
+    plt, sns = _plotting()
+    fig = plt.figure(figsize=(12, 7))
+    sns.set_style("whitegrid")
+
+    sns.barplot(
+        data=crime_counts.sort_values('Avg Annual Crime Rate per 1000', ascending=False),
+        x='Avg Annual Crime Rate per 1000',
+        y='Police Force',
+        hue='Police Force',
+        palette='magma',
+        legend=False
+    )
+
+    plt.title('Average Annual Crime Rate per 1,000 People', fontsize=16, weight='bold')
+    plt.xlabel('Crimes Recorded per 1,000 People (Approx. Annual Rate)', fontsize=12)
+    plt.ylabel(None)
+
+    plt.tight_layout()
+    return fig
+
+
+def plot_seasonality(avg_monthly_counts):
+    """One line chart per crime type of the average monthly rate of each force."""
+    _, sns = _plotting()
+    sns.set_style("whitegrid")
+
+    # Create a faceted plot to show each crime type separately
+    g = sns.FacetGrid(avg_monthly_counts, col="Crime type", hue="Falls within", height=6, aspect=1.2, sharey=False, palette='viridis')
+    g.map(sns.lineplot, "Month_Num", "Avg Monthly Rate per 100k", linewidth=3, marker='o', markersize=8)
+    g.add_legend(title='Police Force')
+
+    # Improve the plot aesthetics
+    g.fig.suptitle('Seasonal Crime Rate Patterns', y=1.03, fontsize=16, weight='bold')
+    g.set_axis_labels("Month of the Year", "Avg. Incidents per 100k People")
+    g.set_titles("Crime Type: {col_name}")
+    g.set(xticks=range(1, 13))
+
+    # FIX: Adjust the plot to make space for the legend on the right
+    g.fig.subplots_adjust(right=0.85)
+    return g.fig
+
+
+def plot_unsolved_rates(outcome_df, crimes_to_compare=KEY_CRIMES):
+    """Unsolved rate of each force, one panel per crime type."""
+    _, sns = _plotting()
+    plot_data = outcome_df[outcome_df['Crime type'].isin(crimes_to_compare)]
+
+    # Create the faceted plot with the warning fix
+    g = sns.catplot(
+        data=plot_data,
+        x='Unsolved Rate (%)',
+        y='Falls within',
+        col='Crime type',
+        kind='bar',
+        hue='Falls within', # FIX: Assign the y-variable to hue
+        legend=False,       # FIX: Disable the automatic legend
+        col_wrap=2,
+        sharex=False,
+        palette='plasma',
+        height=4,
+        aspect=1.5
+    )
+
+    g.fig.suptitle('Percentage of Unsolved Crimes by Type', y=1.03, fontsize=16, weight='bold')
+    g.set_axis_labels('Unsolved Rate (%)', 'Police Force')
+    g.set_titles("Crime Type: {col_name}")
+
+    g.fig.tight_layout(rect=[0, 0, 1, 0.97])
+    return g.fig
+
+
+def plot_priority_matrix(priority_df, area_name='Oxford'):
+    """Volume vs. unsolved rate scatter, split into four quadrants at the medians."""
+    plt, sns = _plotting()
+    fig = plt.figure(figsize=(14, 10))
+    sns.set_style("whitegrid")
+
+    # Create the scatter plot
+    ax = sns.scatterplot(
+        data=priority_df,
+        x='Total Volume',
+        y='Unsolved Rate (%)',
+        size='Total Volume',
+        sizes=(100, 2000),
+        palette='plasma',
+        hue='Unsolved Rate (%)',
+        legend=False
+    )
+
+    # Add labels to each point
+    for volume, rate, crime_type in zip(priority_df['Total Volume'], priority_df['Unsolved Rate (%)'], priority_df['Crime type']):
+        plt.text(volume + 50, rate, crime_type, fontsize=9)
+
+    # Add lines for the four quadrants
+    plt.axvline(priority_df['Total Volume'].median(), color='grey', linestyle='--')
+    plt.axhline(priority_df['Unsolved Rate (%)'].median(), color='grey', linestyle='--')
+
+    # Add quadrant labels
+    ax.text(0.98, 0.98, 'High Volume,\nHigh Unsolved Rate\n(CHRONIC PROBLEMS)', transform=ax.transAxes, ha='right', va='top', fontsize=12, weight='bold', color='red')
+    ax.text(0.02, 0.98, 'Low Volume,\nHigh Unsolved Rate\n(Niche Challenges)', transform=ax.transAxes, ha='left', va='top', fontsize=12)
+    ax.text(0.02, 0.02, 'Low Volume,\nLow Unsolved Rate\n(Well-Managed)', transform=ax.transAxes, ha='left', va='bottom', fontsize=12)
+    ax.text(0.98, 0.02, 'High Volume,\nLow Unsolved Rate\n(Effective Process)', transform=ax.transAxes, ha='right', va='bottom', fontsize=12)
+
+    # Set titles and labels
+    plt.title(f'Crime Priority Matrix for {area_name}', fontsize=18, weight='bold')
+    plt.xlabel('Crime Volume (Number of Incidents)', fontsize=12)
+    plt.ylabel('Unsolved Rate (%)', fontsize=12)
+    plt.xlim(0, priority_df['Total Volume'].max() * 1.15) # Adjust x-axis limit
+    plt.ylim(0, 100)
+
+    plt.tight_layout()
+    return fig
+
+
+def plot_theft_hotspots(theft_df, region='Oxford'):
+    """Theft density over a region, on top of the OpenStreetMap background."""
+    plt, sns = _plotting()
+    region = get_region(region)
+    fig, ax = plt.subplots(figsize=(12, 12))
+
+    # The density uses every theft passed in but is only evaluated over the region.
+    theft_density = region_density(theft_df, region)
+    plot_density(
+        ax, theft_density,
+        cmap=sns.color_palette('rocket_r', as_cmap=True),
+        thresh=0.05,
+        alpha=0.6 # Made it slightly more transparent to see the map
+    )
+
+    # Limit the plot to the region
+    ax.set_xlim(region.lon_bounds)
+    ax.set_ylim(region.lat_bounds)
+
+    # Add the OpenStreetMap background from the local tile store
+    add_basemap(ax)
+
+    # Improve aesthetics
+    ax.set_title(f'Overall Theft Hotspots in {region.name}', fontsize=18, weight='bold')
+    ax.axis('off')
+    return fig
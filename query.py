@@ -0,0 +1,274 @@
+import os
+import re
+import pandas as pd
+from instrument import traced
+from loader import (main_folder_path, cache_folder_path, load_workers, ANALYSIS_COLUMNS, CLEAN_COLUMNS,
+                    CRIME_DTYPES, find_csv_files, concat_crime_frames, map_files, pyarrow_available)
+from regions import Region, get_region
+
+# Lazy queries over the street data with predicate and projection pushdown.
+# Filters on force, crime type, month range and bounding box (or a named
+# region) are only recorded until collect(). Files of other forces or months
+# are then skipped from their names (police.uk's YYYY-MM-<force>-street.csv,
+# or the cache's force=/month= partitions), only the needed columns are
+# decoded, and Parquet row groups are filtered by pyarrow. with_outcomes()
+# joins the latest outcome of every crime from the matching outcomes files.
+#
+#   oxford_df = CrimeQuery().region('Oxford').select('Crime type', 'Last outcome category').collect()
+
+# The force part of police.uk file names ('Falls within' -> slug). Files are
+# only skipped by name when both the wanted forces and the file's slug are
+# listed here; other files are read and their rows filtered.
+FORCE_FILE_SLUGS = {
+    'Avon and Somerset Constabulary': 'avon-and-somerset',
+    'Bedfordshire Police': 'bedfordshire',
+    'British Transport Police': 'btp',
+    'Cambridgeshire Constabulary': 'cambridgeshire',
+    'Cheshire Constabulary': 'cheshire',
+    'City of London Police': 'city-of-london',
+    'Cleveland Police': 'cleveland',
+    'Cumbria Constabulary': 'cumbria',
+    'Derbyshire Constabulary': 'derbyshire',
+    'Devon & Cornwall Police': 'devon-and-cornwall',
+    'Dorset Police': 'dorset',
+    'Durham Constabulary': 'durham',
+    'Dyfed-Powys Police': 'dyfed-powys',
+    'Essex Police': 'essex',
+    'Gloucestershire Constabulary': 'gloucestershire',
+    'Greater Manchester Police': 'greater-manchester',
+    'Gwent Police': 'gwent',
+    'Hampshire Constabulary': 'hampshire',
+    'Hertfordshire Constabulary': 'hertfordshire',
+    'Humberside Police': 'humberside',
+    'Kent Police': 'kent',
+    'Lancashire Constabulary': 'lancashire',
+    'Leicestershire Police': 'leicestershire',
+    'Lincolnshire Police': 'lincolnshire',
+    'Merseyside Police': 'merseyside',
+    'Metropolitan Police Service': 'metropolitan',
+    'Norfolk Constabulary': 'norfolk',
+    'North Wales Police': 'north-wales',
+    'North Yorkshire Police': 'north-yorkshire',
+    'Northamptonshire Police': 'northamptonshire',
+    'Northumbria Police': 'northumbria',
+    'Nottinghamshire Police': 'nottinghamshire',
+    'Police Service of Northern Ireland': 'northern-ireland',
+    'South Wales Police': 'south-wales',
+    'South Yorkshire Police': 'south-yorkshire',
+    'Staffordshire Police': 'staffordshire',
+    'Suffolk Constabulary': 'suffolk',
+    'Surrey Police': 'surrey',
+    'Sussex Police': 'sussex',
+    'Thames Valley Police': 'thames-valley',
+    'Warwickshire Police': 'warwickshire',
+    'West Mercia Police': 'west-mercia',
+    'West Midlands Police': 'west-midlands',
+    'West Yorkshire Police': 'west-yorkshire',
+    'Wiltshire Police': 'wiltshire',
+}
+_KNOWN_FILE_SLUGS = set(FORCE_FILE_SLUGS.values())
+
+_STREET_FILE = re.compile(r'^(\d{4}-\d{2})-(.+)-(?:street|outcomes)\.csv$')
+_PARTITION = re.compile(r'force=([^/\\]+)[/\\]month=(\d{4}-\d{2})')
+
+
+def force_file_slug(force):
+    """The force part of a police.uk street file name, e.g. 'thames-valley', or None if not known."""
+    return FORCE_FILE_SLUGS.get(force)
+
+
+def file_partition(file_path):
+    """(force slug, 'YYYY-MM') from a street or outcomes file or cache partition path, or None if unknown."""
+    match = _PARTITION.search(file_path)
+    if match:
+        return match.group(1), match.group(2)
+    match = _STREET_FILE.match(os.path.basename(file_path))
+    if match:
+        return match.group(2), match.group(1)
+    return None
+
+
+def _month(value):
+    return None if value is None else pd.Timestamp(value).strftime('%Y-%m')
+
+
+class CrimeQuery:
+    """A lazily evaluated selection of crime rows and columns.
+
+    Every filter method returns a new query; nothing is read until collect().
+    """
+
+    def __init__(self, folder_path=main_folder_path, cache_dir=cache_folder_path, workers=load_workers):
+        self.folder_path = folder_path
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.filters = {'forces': None, 'crime_types': None, 'months': (None, None), 'regions': [], 'outcomes': False}
+        self.columns = list(ANALYSIS_COLUMNS)
+
+    def _with(self, **filters):
+        query = CrimeQuery(self.folder_path, self.cache_dir, self.workers)
+        query.filters = dict(self.filters, **filters)
+        query.columns = list(self.columns)
+        return query
+
+    @staticmethod
+    def _narrow(current, values):
+        values = [values] if isinstance(values, str) else list(values)
+        return values if current is None else [v for v in current if v in values]
+
+    def forces(self, *forces):
+        """Keeps the crimes of these forces ('Falls within')."""
+        return self._with(forces=self._narrow(self.filters['forces'], forces))
+
+    def crime_types(self, *crime_types):
+        if len(crime_types) == 1 and not isinstance(crime_types[0], str):
+            crime_types = crime_types[0]
+        return self._with(crime_types=self._narrow(self.filters['crime_types'], crime_types))
+
+    def months(self, start=None, end=None):
+        """Keeps the months from start to end, inclusive ('YYYY-MM' or dates; None is open)."""
+        old_start, old_end = self.filters['months']
+        start, end = _month(start), _month(end)
+        start = max(filter(None, [old_start, start]), default=None)
+        end = min(filter(None, [old_end, end]), default=None)
+        return self._with(months=(start, end))
+
+    def region(self, region):
+        """Keeps the crimes inside a named (or Region) area, and of its force if it has one."""
+        region = get_region(region)
+        query = self._with(regions=self.filters['regions'] + [region])
+        return query.forces(region.force) if region.force is not None else query
+
+    def bbox(self, lon_bounds, lat_bounds):
+        return self.region(Region('bbox', lon_bounds, lat_bounds))
+
+    def with_outcomes(self):
+        """Updates 'Last outcome category' with the latest outcome from the outcomes files."""
+        return self._with(outcomes=True)
+
+    def select(self, *columns):
+        """The columns collect() returns."""
+        query = self._with()
+        query.columns = list(columns[0] if len(columns) == 1 and not isinstance(columns[0], str) else columns)
+        return query
+
+    # --- Planning ---
+
+    def _read_columns(self):
+        needed = list(self.columns)
+        if self.filters['forces'] is not None:
+            needed.append('Falls within')
+        if self.filters['crime_types'] is not None:
+            needed.append('Crime type')
+        if self.filters['months'] != (None, None):
+            needed.append('Month')
+        if self.filters['regions']:
+            needed += ['Longitude', 'Latitude']
+        return list(dict.fromkeys(needed + self._join_columns()))
+
+    def _join_columns(self):
+        return ['Crime ID', 'Last outcome category'] if self.filters['outcomes'] else []
+
+    def _uses_cache(self):
+        return bool(self.cache_dir) and set(self._read_columns()) <= set(CLEAN_COLUMNS) and pyarrow_available()
+
+    def _keep_file(self, file_path, cache_slugs=False, outcomes=False):
+        partition = file_partition(file_path)
+        if partition is None:
+            return True
+        force_slug, month = partition
+        forces = self.filters['forces']
+        if forces is not None and cache_slugs:
+            # Cache partitions are named after the 'Falls within' of their rows.
+            from cache import _slug
+            if force_slug not in {_slug(force) for force in forces}:
+                return False
+        elif forces is not None:
+            # A source file is only skipped when its name surely belongs to another force.
+            slugs = {force_file_slug(force) for force in forces}
+            if None not in slugs and force_slug in _KNOWN_FILE_SLUGS and force_slug not in slugs:
+                return False
+        start, end = self.filters['months']
+        # Outcomes of a month's crimes are published in that month or later.
+        return (start is None or month >= start) and (end is None or month <= end or outcomes)
+
+    def files(self):
+        """The files collect() will read after pruning by force and month."""
+        csv_files = [f for f in find_csv_files(self.folder_path) if self._keep_file(f)]
+        if self._uses_cache():
+            # Only the CSVs that survive pruning are parsed into the cache.
+            from cache import refresh_cache
+            return [f for f in refresh_cache(self.folder_path, self.cache_dir, self.workers, files=csv_files)
+                    if self._keep_file(os.path.relpath(f, self.cache_dir), cache_slugs=True)]
+        return csv_files
+
+    def outcome_files(self):
+        """The outcomes files with_outcomes() will read after pruning by force and month."""
+        return [f for f in find_csv_files(self.folder_path, 'outcomes') if self._keep_file(f, outcomes=True)]
+
+    def _parquet_filters(self):
+        filters = []
+        if self.filters['forces'] is not None:
+            filters.append(('Falls within', 'in', self.filters['forces']))
+        if self.filters['crime_types'] is not None:
+            filters.append(('Crime type', 'in', self.filters['crime_types']))
+        for region in self.filters['regions']:
+            filters += [('Longitude', '>=', region.lon_bounds[0]), ('Longitude', '<=', region.lon_bounds[1]),
+                        ('Latitude', '>=', region.lat_bounds[0]), ('Latitude', '<=', region.lat_bounds[1])]
+        return filters or None
+
+    # --- Execution ---
+
+    def _filter_rows(self, df):
+        keep = pd.Series(True, index=df.index)
+        if self.filters['forces'] is not None:
+            keep &= df['Falls within'].isin(self.filters['forces'])
+        if self.filters['crime_types'] is not None:
+            keep &= df['Crime type'].isin(self.filters['crime_types'])
+        start, end = self.filters['months']
+        if start is not None:
+            keep &= df['Month'] >= pd.Timestamp(start)
+        if end is not None:
+            keep &= df['Month'] <= pd.Timestamp(end)
+        for region in self.filters['regions']:
+            keep &= region.contains(df['Longitude'].to_numpy(), df['Latitude'].to_numpy())
+        return df.loc[keep.to_numpy(), list(dict.fromkeys(self.columns + self._join_columns()))]
+
+    def _read_csv(self, file_path):
+        # Coordinates are always read to drop unmapped crimes, like read_crime_csv.
+        read_columns = list(dict.fromkeys(self._read_columns() + ['Longitude', 'Latitude']))
+        df = pd.read_csv(
+            file_path,
+            usecols=lambda c: c in read_columns,
+            dtype={c: t for c, t in CRIME_DTYPES.items() if c in read_columns},
+            parse_dates=['Month'] if 'Month' in read_columns else False,
+            date_format='%Y-%m',
+        )
+        return self._filter_rows(df.dropna(subset=['Longitude', 'Latitude']))
+
+    def _read_parquet(self, file_path):
+        df = pd.read_parquet(file_path, columns=self._read_columns(), filters=self._parquet_filters(), memory_map=True)
+        return self._filter_rows(df)
+
+    @traced('query_collect')
+    def collect(self):
+        """Reads the remaining files and returns the matching rows as a DataFrame."""
+        read = self._read_parquet if self._uses_cache() else self._read_csv
+        files = self.files()
+        if not files and not find_csv_files(self.folder_path):
+            raise FileNotFoundError(f"No CSV files found in '{self.folder_path}'.")
+        frames = map_files(read, files, self.workers)
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        crime_df = concat_crime_frames(frames)
+        if self.filters['outcomes']:
+            from tables import join_latest_outcomes, read_outcomes_csv
+            outcomes_df = concat_crime_frames(map_files(read_outcomes_csv, self.outcome_files(), self.workers))
+            if len(outcomes_df):
+                crime_df = join_latest_outcomes(crime_df, outcomes_df)
+        return crime_df[self.columns]
+
+    def count(self, by):
+        """Number of matching crimes per combination of the `by` columns."""
+        from streaming import count_crimes
+        return count_crimes(self.select(*by).collect(), by)
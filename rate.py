@@ -1,82 +1,41 @@
-This `NameError` means your new script (`rate.py`) is missing the first two essential parts: loading the data and cleaning it. The script tried to use the `crime_df` DataFrame before it was created.
-
-Here is the complete, single script that does everything in the correct order. Replace the entire contents of your `rate.py` file with this code.
-
------
-
-## Complete Script: Load, Clean, and Calculate Rate
-
-```python
-import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# --- Part 1: Loading the Data ---
-main_folder_path = '/Users/nirajmutha/Downloads/Crime'
-print("Loading data...")
-
-all_csv_files = []
-try:
-    for root, dirs, files in os.walk(main_folder_path):
-        for file in files:
-            if file.endswith('.csv'):
-                full_path = os.path.join(root, file)
-                all_csv_files.append(full_path)
-except FileNotFoundError:
-    print(f"Error: Directory not found at '{main_folder_path}'.")
-    exit()
-
-if all_csv_files:
-    df_list = [pd.read_csv(file) for file in all_csv_files]
-    crime_df = pd.concat(df_list, ignore_index=True)
-else:
-    print("No CSV files found.")
-    exit()
-
-# --- Part 2: Cleaning the Data ---
-print("Cleaning data...")
-crime_df.drop(columns=['Context', 'Crime ID'], inplace=True, errors='ignore')
-crime_df.dropna(subset=['Longitude', 'Latitude'], inplace=True)
-crime_df['Month'] = pd.to_datetime(crime_df['Month'], format='%Y-%m')
-
-# --- Part 3: Crime Rate Calculation ---
-print("Calculating crime rates...")
-population_data = {
-    'Thames Valley Police': 2340000,
-    'Cambridgeshire Constabulary': 678600,
-    'Metropolitan Police Service': 9000000
-}
-
-crime_counts = crime_df['Falls within'].value_counts().reset_index()
-crime_counts.columns = ['Police Force', 'Total Crimes']
-crime_counts['Population'] = crime_counts['Police Force'].map(population_data)
-
-# The data covers a 2-year period, so we divide by 2 for an approximate annual rate.
-crime_counts['Avg Annual Crime Rate per 1000'] = (crime_counts['Total Crimes'] / crime_counts['Population'] / 2) * 1000
-
-# --- Part 4: Visualization ---
-print("Generating chart...")
-plt.figure(figsize=(12, 7))
-sns.set_style("whitegrid")
-
-ax = sns.barplot(
-    data=crime_counts.sort_values('Avg Annual Crime Rate per 1000', ascending=False),
-    x='Avg Annual Crime Rate per 1000',
-    y='Police Force',
-    palette='magma'
-)
-
-plt.title('Average Annual Crime Rate per 1,000 People', fontsize=16, weight='bold')
-plt.xlabel('Crimes Recorded per 1,000 People (Approx. Annual Rate)', fontsize=12)
-plt.ylabel(None)
-
-plt.tight_layout()
-plt.show()
-
-# Display the final data table
-print("\nFinal Data:")
-print(crime_counts)
-
-print("\nProcess finished.")
-```
\ No newline at end of file
+from loader import load_crime_data, main_folder_path
+from streaming import streaming_mode, stream_counts, count_crimes
+from timeindex import TimeIndex
+from analysis import crime_rates
+from plots import compute_only, plot_crime_rates, show
+
+# The CSVs are parsed on a process pool when CRIME_LOAD_WORKERS > 1, so the
+# script body must only run in the main process.
+if __name__ == '__main__':
+    # --- Part 1 & 2: Loading and Cleaning the Data ---
+    # Only the monthly totals per force are needed, so streaming mode never builds crime_df.
+    count_columns = ['Falls within', 'Month']
+    try:
+        if streaming_mode:
+            print("Counting crimes while reading (streaming mode)...")
+            time_index = TimeIndex.from_counts(stream_counts(main_folder_path, count_columns))
+        else:
+            print("Loading and cleaning data...")
+            time_index = TimeIndex.from_counts(count_crimes(load_crime_data(main_folder_path), count_columns))
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit()
+
+    # --- Part 3: Crime Rate Calculation ---
+    print("Calculating crime rates...")
+    # Annual rate over the months actually loaded (e.g. 24 months = 2 years).
+    print(f"Data covers {time_index.period_label()} ({time_index.span_months} months).")
+    force_counts = time_index.counts(by='Falls within').sort_values(ascending=False)
+    crime_counts = crime_rates(force_counts, years=time_index.years)
+
+    # --- Part 4: Visualization ---
+    if not compute_only:
+        print("Generating chart...")
+        plot_crime_rates(crime_counts)
+        show()
+
+    # Display the final data table
+    print("\nFinal Data:")
+    print(crime_counts)
+
+    print("\nProcess finished.")
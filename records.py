@@ -0,0 +1,241 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+from instrument import traced
+from loader import (main_folder_path, cache_folder_path, load_workers, CLEAN_COLUMNS, CRIME_TYPES,
+                    find_csv_files, read_crime_csv, map_files, pyarrow_available)
+
+# Compact column store of cleaned crime records.
+# Label columns are stored as the smallest integer codes into vocabularies
+# shared by every store built with them (so stores concatenate without any
+# remapping), coordinates as fixed-point int32 micro-degrees and Month as an
+# int16 month number. A DataFrame is only built when an analysis asks for one.
+# Coordinates read from the CSVs are parsed as float64, so the 6 decimals
+# police.uk publishes are kept exactly; the Parquet cache holds float32
+# coordinates, which are only within a few micro-degrees.
+
+# Micro-degrees: police.uk coordinates have 6 decimals.
+COORDINATE_SCALE = 1_000_000
+MISSING_COORDINATE = np.iinfo(np.int32).min
+MISSING_MONTH = np.iinfo(np.int16).min
+MISSING_CODE = -1
+
+COORDINATE_COLUMNS = ['Longitude', 'Latitude']
+# Crime IDs are unique per row, so they are left out of the label vocabularies.
+RECORD_COLUMNS = [column for column in CLEAN_COLUMNS if column != 'Crime ID']
+
+
+def _code_dtype(n_labels):
+    """Smallest signed integer type for codes 0..n_labels-1 plus the missing code -1."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_labels <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def month_numbers(months):
+    """Months since January 1970 of datetime values, as int16 (missing: MISSING_MONTH)."""
+    months = pd.to_datetime(pd.Series(months)).to_numpy().astype('datetime64[M]')
+    numbers = months.astype(np.int64)
+    numbers[np.isnat(months)] = MISSING_MONTH
+    return numbers.astype(np.int16)
+
+
+def month_timestamps(numbers):
+    """Inverse of month_numbers()."""
+    numbers = np.asarray(numbers)
+    months = numbers.astype('datetime64[M]').astype('datetime64[ns]')
+    months[numbers == MISSING_MONTH] = np.datetime64('NaT')
+    return months
+
+
+def to_fixed_point(values):
+    values = np.asarray(values, dtype=np.float64)
+    fixed = np.round(values * COORDINATE_SCALE)
+    fixed[np.isnan(values)] = MISSING_COORDINATE
+    return fixed.astype(np.int32)
+
+
+def from_fixed_point(fixed, dtype=np.float64):
+    values = fixed.astype(dtype) / COORDINATE_SCALE
+    values[fixed == MISSING_COORDINATE] = np.nan
+    return values
+
+
+class Vocabulary:
+    """Label lists per column, grown as new labels are encoded.
+
+    Codes are positions in these lists and never change, so every store
+    encoded with the same Vocabulary shares its codes.
+    """
+
+    def __init__(self, labels=None):
+        self.labels = {column: list(values) for column, values in (labels or {}).items()}
+        self._positions = {column: {label: i for i, label in enumerate(values)}
+                           for column, values in self.labels.items()}
+
+    def encode(self, column, values):
+        """Codes of the values (MISSING_CODE for missing ones), adding unseen labels."""
+        labels = self.labels.setdefault(column, [])
+        positions = self._positions.setdefault(column, {})
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            # Only the distinct labels are looked up; rows map through their codes.
+            categories, codes = values.cat.categories, values.cat.codes.to_numpy()
+        else:
+            codes, categories = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        for label in categories:
+            if label not in positions:
+                positions[label] = len(labels)
+                labels.append(label)
+        mapping = np.array([positions[label] for label in categories] + [MISSING_CODE], dtype=np.int64)
+        return mapping[codes].astype(_code_dtype(len(labels)))
+
+    def categories(self, column):
+        return pd.Index(self.labels.get(column, []), dtype=object)
+
+    def code_of(self, column, label):
+        """The code of a label, or None if it has never been seen."""
+        return self._positions.get(column, {}).get(label)
+
+
+def crime_vocabulary():
+    """A Vocabulary with the 14 crime types already in a fixed order."""
+    return Vocabulary({'Crime type': CRIME_TYPES})
+
+
+class CrimeRecords:
+    """Cleaned crime rows as compact NumPy columns plus a shared Vocabulary."""
+
+    def __init__(self, columns, vocabulary):
+        self.columns = columns
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_frame(cls, crime_df, vocabulary=None):
+        """Encodes a cleaned crime DataFrame (e.g. from load_crime_data)."""
+        vocabulary = vocabulary if vocabulary is not None else crime_vocabulary()
+        columns = {}
+        for column in crime_df.columns:
+            values = crime_df[column]
+            if column in COORDINATE_COLUMNS:
+                columns[column] = to_fixed_point(values)
+            elif column == 'Month':
+                columns[column] = month_numbers(values)
+            else:
+                columns[column] = vocabulary.encode(column, values)
+        return cls(columns, vocabulary)
+
+    @classmethod
+    def concat(cls, parts, vocabulary=None):
+        """Stacks stores that share one Vocabulary."""
+        parts = list(parts)
+        if not parts:
+            return cls({}, vocabulary if vocabulary is not None else crime_vocabulary())
+        vocabulary = parts[0].vocabulary
+        if any(part.vocabulary is not vocabulary for part in parts):
+            raise ValueError("CrimeRecords can only be concatenated when they share a Vocabulary.")
+        columns = {column: np.concatenate([part.columns[column] for part in parts]) for column in parts[0].columns}
+        return cls(columns, vocabulary)
+
+    def recode(self, vocabulary):
+        """The same records with their label codes translated into another Vocabulary."""
+        columns = {}
+        for column, values in self.columns.items():
+            if column in COORDINATE_COLUMNS or column == 'Month':
+                columns[column] = values
+                continue
+            codes = vocabulary.encode(column, self.vocabulary.labels.get(column, []))
+            mapping = np.append(codes.astype(np.int64), MISSING_CODE)
+            columns[column] = mapping[values].astype(_code_dtype(len(vocabulary.labels[column])))
+        return CrimeRecords(columns, vocabulary)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns (the vocabulary is shared and small)."""
+        return sum(values.nbytes for values in self.columns.values())
+
+    def memory_usage(self):
+        return pd.Series({column: values.nbytes for column, values in self.columns.items()}, name='Bytes')
+
+    def codes(self, column, labels):
+        """Codes of the given labels in a column (labels never seen are left out)."""
+        codes = [self.vocabulary.code_of(column, label) for label in labels]
+        return np.array([code for code in codes if code is not None], dtype=np.int64)
+
+    def mask(self, column, labels):
+        """Boolean row mask: the column holds one of the labels. Compares integer codes."""
+        if isinstance(labels, str):
+            labels = [labels]
+        return np.isin(self.columns[column], self.codes(column, labels))
+
+    def take(self, rows):
+        """The records at the given positions or boolean mask, sharing the vocabulary."""
+        return CrimeRecords({column: values[rows] for column, values in self.columns.items()}, self.vocabulary)
+
+    def coordinates(self, dtype=np.float64):
+        """Longitude and latitude arrays in degrees."""
+        return (from_fixed_point(self.columns['Longitude'], dtype),
+                from_fixed_point(self.columns['Latitude'], dtype))
+
+    def to_frame(self, columns=None, coordinate_dtype=np.float32):
+        """Decodes the records into a DataFrame like load_crime_data returns."""
+        data = {}
+        for column in columns or list(self.columns):
+            values = self.columns[column]
+            if column in COORDINATE_COLUMNS:
+                data[column] = from_fixed_point(values, coordinate_dtype)
+            elif column == 'Month':
+                data[column] = month_timestamps(values)
+            else:
+                data[column] = pd.Categorical.from_codes(values, self.vocabulary.categories(column))
+        return pd.DataFrame(data)
+
+    def save(self, path):
+        """Writes the columns and the vocabulary to one .npz file."""
+        arrays = {f'column:{column}': values for column, values in self.columns.items()}
+        arrays.update({f'labels:{column}': np.array(labels, dtype=object)
+                       for column, labels in self.vocabulary.labels.items()})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as arrays:
+            columns = {key[len('column:'):]: arrays[key] for key in arrays.files if key.startswith('column:')}
+            labels = {key[len('labels:'):]: list(arrays[key]) for key in arrays.files if key.startswith('labels:')}
+        return cls(columns, Vocabulary(labels))
+
+
+def _read_records(file_path, columns):
+    """One CSV as CrimeRecords with its own Vocabulary (run in a worker process)."""
+    return CrimeRecords.from_frame(read_crime_csv(file_path, columns, coordinate_dtype='float64'))
+
+
+@traced('load_crime_records')
+def load_crime_records(folder_path=main_folder_path, columns=None, cache_dir=cache_folder_path,
+                       workers=load_workers, vocabulary=None):
+    """Loads every street CSV under folder_path into one CrimeRecords store.
+
+    Every file is encoded as soon as it is read, so only one file per
+    process is ever held as a DataFrame: with workers > 1 the workers send
+    back compact records, which are recoded into the shared vocabulary. The
+    Parquet cache (see cache.py) is used when available; its coordinates are
+    float32, so pass cache_dir=None for exact micro-degrees.
+    """
+    columns = list(columns or RECORD_COLUMNS)
+    vocabulary = vocabulary if vocabulary is not None else crime_vocabulary()
+    if cache_dir and set(columns) <= set(CLEAN_COLUMNS) and pyarrow_available():
+        from cache import refresh_cache
+        files = refresh_cache(folder_path, cache_dir, workers)
+        frames = (pd.read_parquet(file, columns=columns, memory_map=True) for file in files)
+    else:
+        files = find_csv_files(folder_path)
+        frames = None if workers > 1 else (read_crime_csv(file, columns, 'float64') for file in files)
+    if not files:
+        raise FileNotFoundError(f"No CSV files found in '{folder_path}'.")
+    if frames is None:
+        parts = map_files(partial(_read_records, columns=columns), files, workers)
+        return CrimeRecords.concat([part.recode(vocabulary) for part in parts], vocabulary)
+    return CrimeRecords.concat([CrimeRecords.from_frame(frame, vocabulary) for frame in frames], vocabulary)
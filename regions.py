@@ -0,0 +1,187 @@
+import json
+import numpy as np
+from instrument import traced
+
+# Named regions and a uniform-grid spatial index over the crime coordinates.
+# select_region() only checks the rows in the grid cells a region overlaps,
+# instead of comparing every row against the bounds. Boundaries such as the
+# London boroughs are registered from a GeoJSON file with load_regions().
+
+
+class Region:
+    """A named area: a bounding box, optionally refined by a polygon and a force.
+
+    The polygon is a list of (longitude, latitude) vertices, or a list of such
+    rings (islands and holes), tested together with the even-odd rule.
+    """
+
+    def __init__(self, name, lon_bounds, lat_bounds, polygon=None, force=None):
+        self.name = name
+        self.lon_bounds = list(lon_bounds)
+        self.lat_bounds = list(lat_bounds)
+        self.polygon = None if polygon is None else _rings(polygon)
+        self.force = force
+
+    @classmethod
+    def from_polygon(cls, name, polygon, force=None):
+        """Builds a region from a list of (longitude, latitude) vertices, or a list of rings."""
+        points = np.concatenate(_rings(polygon))
+        return cls(name, [points[:, 0].min(), points[:, 0].max()],
+                   [points[:, 1].min(), points[:, 1].max()], polygon=polygon, force=force)
+
+    def contains(self, lon, lat):
+        """Boolean mask of the points inside the region (bounds are inclusive)."""
+        inside = ((lon >= self.lon_bounds[0]) & (lon <= self.lon_bounds[1]) &
+                  (lat >= self.lat_bounds[0]) & (lat <= self.lat_bounds[1]))
+        if self.polygon is not None:
+            in_rings = np.zeros(len(inside), dtype=bool)
+            for ring in self.polygon:
+                in_rings ^= points_in_polygon(lon, lat, ring)
+            inside &= in_rings
+        return inside
+
+
+def _rings(polygon):
+    """A polygon as a list of (N, 2) vertex arrays."""
+    if np.ndim(polygon[0][0]) == 0:
+        polygon = [polygon]
+    return [np.asarray(ring, dtype=float) for ring in polygon]
+
+
+def points_in_polygon(lon, lat, polygon):
+    """Even-odd ray casting test of many points against one polygon."""
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    inside = np.zeros(len(lon), dtype=bool)
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        crosses = (y1 > lat) != (y2 > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lon < x_cross)
+        x1, y1 = x2, y2
+    return inside
+
+
+# Registry of named regions. Use register_region() to add towns, boroughs or polygons.
+REGIONS = {}
+
+
+def register_region(region):
+    REGIONS[region.name] = region
+    return region
+
+
+def get_region(region):
+    """Accepts a Region or the name of a registered one."""
+    if isinstance(region, Region):
+        return region
+    try:
+        return REGIONS[region]
+    except KeyError:
+        raise KeyError(f"Unknown region '{region}'. Known regions: {', '.join(sorted(REGIONS))}") from None
+
+
+def load_regions(path, name_property='name', force=None):
+    """Registers every Polygon or MultiPolygon feature of a GeoJSON file (lon/lat) as a region.
+
+    name_property is the feature property holding the region name, e.g.
+    'LAD23NM' in the ONS local authority boundaries. Returns the names.
+    """
+    with open(path) as f:
+        features = json.load(f)['features']
+    names = []
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            rings = geometry['coordinates']
+        elif geometry.get('type') == 'MultiPolygon':
+            rings = [ring for part in geometry['coordinates'] for ring in part]
+        else:
+            continue
+        name = str(feature['properties'][name_property])
+        register_region(Region.from_polygon(name, [[point[:2] for point in ring] for ring in rings], force=force))
+        names.append(name)
+    return names
+
+
+# Built in: three town centres as boxes. London's boroughs (or any other
+# boundaries) are loaded from a boundary file with load_regions().
+register_region(Region('Oxford', [-1.32, -1.18], [51.72, 51.79], force='Thames Valley Police'))
+register_region(Region('Cambridge', [0.07, 0.19], [52.17, 52.24], force='Cambridgeshire Constabulary'))
+register_region(Region('Central London', [-0.20, -0.07], [51.48, 51.54], force='Metropolitan Police Service'))
+
+
+class SpatialIndex:
+    """Uniform grid over longitude/latitude with rows sorted by cell.
+
+    Rows of one grid column (same longitude cell) are contiguous and sorted by
+    latitude cell, so a bounding box maps to one slice per longitude cell.
+    """
+
+    def __init__(self, lon, lat, cell_size=0.01):
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        self.cell_size = cell_size
+        self.lon_min = lon.min() if len(lon) else 0.0
+        self.lat_min = lat.min() if len(lat) else 0.0
+        ix = self._cell(lon, self.lon_min)
+        iy = self._cell(lat, self.lat_min)
+        self.n_lat_cells = int(iy.max()) + 1 if len(iy) else 1
+        self.n_lon_cells = int(ix.max()) + 1 if len(ix) else 1
+
+        cell_ids = ix * self.n_lat_cells + iy
+        self.order = np.argsort(cell_ids, kind='stable')
+        self.sorted_cells = cell_ids[self.order]
+
+    def _cell(self, values, origin):
+        return np.floor((values - origin) / self.cell_size).astype(np.int64)
+
+    def candidates(self, lon_bounds, lat_bounds):
+        """Row positions in the grid cells overlapping the box (a superset of the hits)."""
+        # Widen slightly so float32 coordinates sitting on a bound are never missed.
+        pad = np.array([-1e-6, 1e-6])
+        ix0, ix1 = np.clip(self._cell(np.array(lon_bounds, dtype=float) + pad, self.lon_min), 0, self.n_lon_cells - 1)
+        iy0, iy1 = np.clip(self._cell(np.array(lat_bounds, dtype=float) + pad, self.lat_min), 0, self.n_lat_cells - 1)
+        columns = np.arange(ix0, ix1 + 1) * self.n_lat_cells
+        starts = np.searchsorted(self.sorted_cells, columns + iy0, side='left')
+        ends = np.searchsorted(self.sorted_cells, columns + iy1, side='right')
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.order[s:e] for s, e in zip(starts, ends)]))
+
+
+@traced('build_spatial_index')
+def build_spatial_index(crime_df, cell_size=0.01):
+    return SpatialIndex(crime_df['Longitude'].to_numpy(), crime_df['Latitude'].to_numpy(), cell_size)
+
+
+@traced('select_region')
+def select_region(crime_df, region, index=None):
+    """Rows of crime_df inside a region (and its force, if the region has one).
+
+    Pass an index from build_spatial_index(crime_df) to reuse it across many
+    regions; without one every row is checked.
+    """
+    region = get_region(region)
+    if index is None:
+        rows = np.arange(len(crime_df))
+    else:
+        rows = index.candidates(region.lon_bounds, region.lat_bounds)
+
+    lon = crime_df['Longitude'].to_numpy()[rows]
+    lat = crime_df['Latitude'].to_numpy()[rows]
+    inside = region.contains(lon, lat)
+    if region.force is not None:
+        inside &= _equals(crime_df['Falls within'], region.force, rows)
+    return crime_df.iloc[rows[inside]]
+
+
+def _equals(column, value, rows):
+    """column == value for the given row positions, comparing category codes when possible."""
+    if hasattr(column, 'cat'):
+        categories = column.cat.categories
+        if value not in categories:
+            return np.zeros(len(rows), dtype=bool)
+        return column.cat.codes.to_numpy()[rows] == categories.get_loc(value)
+    return column.to_numpy()[rows] == value
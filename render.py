@@ -0,0 +1,105 @@
+import os
+import time
+from regions import build_spatial_index, get_region, select_region
+from instrument import traced
+
+# Batch rendering of per-crime-type hotspot maps ("fingerprint atlas").
+# The data is split by region and crime type once in the parent process; each
+# job then only ships two float32 coordinate arrays to a worker, which draws
+# the map with the Agg backend.
+
+# Processes used for rendering. Scripts that raise this must guard their code
+# with `if __name__ == '__main__':` so the pool can re-import them safely.
+render_workers = int(os.environ.get('CRIME_RENDER_WORKERS', '1'))
+
+ATLAS_COLOR_MAPS = ['Reds', 'Blues', 'Greens', 'Purples', 'Oranges', 'Greys', 'YlOrBr',
+                    'PuRd', 'BuGn', 'RdPu', 'GnBu', 'OrRd', 'YlGn', 'PuBu']
+
+
+def hotspot_filename(region_name, crime_type):
+    return f'{region_name.lower().replace(" ", "_")}_hotspot_{crime_type.lower().replace(" ", "_")}.png'
+
+
+@traced('render_hotspot_map')
+def render_hotspot_map(region, crime_type, color_map, lon, lat, output_dir='.', dpi=300):
+    """Draws and saves the hotspot map of one crime type in one region. Returns the file path."""
+    from matplotlib.figure import Figure
+    from density import kde_grid, plot_density
+    from basemap import add_basemap
+
+    region = get_region(region)
+    bounds = (region.lon_bounds, region.lat_bounds)
+
+    fig = Figure(figsize=(12, 12))
+    ax = fig.subplots()
+
+    # Create the heatmap over the whole region, so every map shares one frame
+    plot_density(ax, kde_grid(lon, lat, bounds=bounds), cmap=color_map, thresh=0.05, alpha=0.6)
+    ax.set_xlim(region.lon_bounds)
+    ax.set_ylim(region.lat_bounds)
+
+    # Add the map background (stitched once per region and process)
+    add_basemap(ax)
+
+    ax.set_title(f'{crime_type} Hotspots in {region.name}', fontsize=18, weight='bold')
+    ax.axis('off')
+
+    image_filename = os.path.join(output_dir, hotspot_filename(region.name, crime_type))
+    fig.savefig(image_filename, dpi=dpi, bbox_inches='tight')
+    return image_filename
+
+
+def _timed_render(job):
+    start = time.perf_counter()
+    image_filename = render_hotspot_map(**job)
+    return image_filename, time.perf_counter() - start
+
+
+def atlas_jobs(regions, crime_types, color_maps=ATLAS_COLOR_MAPS):
+    """(region, crime type, colormap) jobs for every region and crime type."""
+    return [(region, crime_type, color_maps[i % len(color_maps)])
+            for region in regions for i, crime_type in enumerate(crime_types)]
+
+
+@traced('render_atlas')
+def render_atlas(crime_df, jobs, output_dir='.', workers=render_workers, dpi=300):
+    """Renders a batch of (region, crime type, colormap) hotspot maps.
+
+    Each region is selected once and split by crime type in a single groupby.
+    With workers > 1 the maps are drawn on a process pool. Returns one dict per
+    rendered job with the output file and the time it took.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index = build_spatial_index(crime_df)
+
+    # Split every region's rows by crime type once.
+    points = {}
+    for region_name in dict.fromkeys(region for region, _, _ in jobs):
+        region = get_region(region_name)
+        region_df = select_region(crime_df, region, index)
+        for crime_type, group in region_df.groupby('Crime type', observed=True):
+            points[region.name, crime_type] = (group['Longitude'].to_numpy(), group['Latitude'].to_numpy())
+
+    tasks = []
+    for region_name, crime_type, color_map in jobs:
+        region = get_region(region_name)
+        if (region.name, crime_type) not in points or len(points[region.name, crime_type][0]) < 2:
+            print(f"No data found for {crime_type} in {region.name}, skipping map.")
+            continue
+        lon, lat = points[region.name, crime_type]
+        tasks.append(dict(region=region, crime_type=crime_type, color_map=color_map,
+                          lon=lon, lat=lat, output_dir=output_dir, dpi=dpi))
+
+    if workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_timed_render, tasks))
+    else:
+        results = [_timed_render(task) for task in tasks]
+
+    report = []
+    for task, (image_filename, seconds) in zip(tasks, results):
+        print(f" -> {task['crime_type']} in {task['region'].name}: saved '{image_filename}' ({seconds:.2f}s)")
+        report.append({'region': task['region'].name, 'crime_type': task['crime_type'],
+                       'file': image_filename, 'seconds': seconds})
+    return report
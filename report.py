@@ -0,0 +1,232 @@
+import os
+import time
+import argparse
+import pandas as pd
+from instrument import enable_tracing, stage
+from loader import ANALYSIS_COLUMNS, load_workers, main_folder_path
+from tables import load_crimes_with_outcomes
+from streaming import count_crimes, unsolved_rates
+from regions import build_spatial_index, get_region, select_region
+from render import render_atlas, render_workers
+from hotspot_detection import HOT_SPOT, HotspotIndex, detect_hotspots, hotspot_clusters
+from fingerprints import cluster_similarity, region_fingerprints
+from heatmap_export import export_crime_heatmap
+from seasonality import SeasonalityCube
+from timeindex import TimeIndex, rolling_rate_table
+import analysis
+import plots
+
+# Full batch report: loads and cleans the data once (with the latest outcome of
+# every crime), then runs every analysis of the individual scripts against the
+# shared frame and writes the figures and tables to one output directory.
+#
+#   python report.py --output report
+#   python report.py --stages top-crimes crime-rate --output report
+#   python report.py --trace trace.json --profile kde_grid
+#   python report.py --tables-only --output report   # no figures, no plotting libraries
+
+# Crime types of the seasonality chart (hotspot.py).
+SEASONAL_CRIMES = ['Shoplifting', 'Bicycle theft']
+
+# Hotspot maps of the spatial fingerprint (Fingerprint.py), drawn for --region.
+FINGERPRINT_MAPS = [
+    ('Burglary', 'Reds'),
+    ('Shoplifting', 'Blues'),
+    ('Public order', 'Greens'),
+]
+
+HOT_CELL_COLUMNS = ['Crime type', 'Unit', 'Longitude', 'Latitude', 'Count', 'Gi* z', 'p-value', 'Hotspot',
+                    'Cluster', 'Falls within']
+HOTSPOT_COLUMNS = ['Crime type', 'Cluster', 'Units', 'Crimes', 'lon_min', 'lon_max', 'lat_min', 'lat_max',
+                   'peak_z', 'Falls within']
+
+def save_figure(options, filename, plot, *args):
+    """Draws plot(*args) and saves it; nothing (an empty list) with --tables-only."""
+    if options.tables_only:
+        return []
+    import matplotlib
+    matplotlib.use('Agg') # Headless: figures are only saved, never shown
+    import matplotlib.pyplot as plt
+    fig = plot(*args)
+    path = os.path.join(options.output, filename)
+    fig.savefig(path, dpi=options.dpi, bbox_inches='tight')
+    plt.close(fig)
+    return [path]
+
+
+def save_table(df, output_dir, filename):
+    path = os.path.join(output_dir, filename)
+    df.to_csv(path, index=False)
+    return path
+
+
+def top_crimes_stage(crime_df, options):
+    plot_df = analysis.top_crime_counts(count_crimes(crime_df, ['Falls within', 'Crime type']), n=5)
+    return [save_table(plot_df, options.output, 'top_crimes.csv')] + save_figure(
+        options, 'top_crimes.png', plots.plot_top_crimes, plot_df, options.time_index.period_label())
+
+
+def crime_rate_stage(crime_df, options):
+    # Annual rate over the span of the loaded months.
+    force_counts = options.time_index.counts(by='Falls within').sort_values(ascending=False)
+    crime_counts = analysis.crime_rates(force_counts, years=options.time_index.years)
+    return [save_table(crime_counts, options.output, 'crime_rates.csv')] + save_figure(
+        options, 'crime_rates.png', plots.plot_crime_rates, crime_counts)
+
+
+def seasonality_stage(crime_df, options):
+    # Profiles and year-over-year changes of every force and crime type; the chart shows a few.
+    seasonality = SeasonalityCube.from_frame(crime_df)
+    seasonal_table = seasonality.table(analysis.population_data)
+    avg_monthly_counts = seasonal_table[seasonal_table['Crime type'].isin(SEASONAL_CRIMES)]
+    return [save_table(seasonal_table, options.output, 'seasonality.csv'),
+            save_table(seasonality.yoy_table(), options.output, 'seasonality_yoy.csv')] + save_figure(
+        options, 'seasonality.png', plots.plot_seasonality, avg_monthly_counts)
+
+
+def unsolved_rate_stage(crime_df, options):
+    crime_counts = count_crimes(crime_df, ['Falls within', 'Crime type', 'Last outcome category'])
+    outcome_df = unsolved_rates(crime_counts, analysis.UNSOLVED_CATEGORY)
+    return [save_table(outcome_df, options.output, 'unsolved_rates.csv')] + save_figure(
+        options, 'unsolved_rates.png', plots.plot_unsolved_rates, outcome_df)
+
+
+def priority_matrix_stage(crime_df, options):
+    region_df = select_region(crime_df, options.region, options.index)
+    priority_df = analysis.priority_matrix(region_df)
+    name = options.region.lower().replace(' ', '_')
+    # Every force, district and LSOA in one table
+    priority_areas = analysis.priority_table(crime_df)
+    return [save_table(priority_df, options.output, f'{name}_priority_matrix.csv'),
+            save_table(priority_areas, options.output, 'priority_matrix_areas.csv')] + save_figure(
+        options, f'{name}_priority_matrix.png', plots.plot_priority_matrix, priority_df, options.region)
+
+
+def theft_hotspot_stage(crime_df, options):
+    # Every theft of the region's force, evaluated over the region (oxford.py).
+    region = get_region(options.region)
+    name = region.name.lower().replace(' ', '_')
+    force_df = crime_df if region.force is None else crime_df[crime_df['Falls within'] == region.force]
+    theft_df = force_df[force_df['Crime type'].isin(analysis.THEFT_CATEGORIES)]
+    # The interactive bicycle theft map of the region, with its cell tiles next to it.
+    html_path = os.path.join(options.output, f'{name}_bike_theft_hotspots.html')
+    export_crime_heatmap(select_region(theft_df, region), 'Bicycle theft', html_path)
+    if options.tables_only:
+        # The density raster instead of the map (see DensityGrid.load()).
+        path = os.path.join(options.output, f'{name}_theft_density.npz')
+        analysis.region_density(theft_df, region).save(path)
+        return [html_path, path]
+    return [html_path] + save_figure(options, f'{name}_theft_hotspots_with_map.png', plots.plot_theft_hotspots,
+                                     theft_df, region)
+
+
+def fingerprint_stage(crime_df, options):
+    jobs = [(options.region, crime_type, color_map) for crime_type, color_map in FINGERPRINT_MAPS]
+    report = [] if options.tables_only else render_atlas(crime_df, jobs, output_dir=options.output,
+                                                         workers=options.render_workers, dpi=options.dpi)
+    # Similarity of every crime type's fingerprint in the region, with its group.
+    fingerprints = region_fingerprints(crime_df, options.region, min_count=20, index=options.index).smoothed(1.0)
+    similarity = fingerprints.similarity('cosine')
+    similarity.insert(0, 'Group', cluster_similarity(similarity, threshold=0.8) + 1)
+    name = options.region.lower().replace(' ', '_')
+    return [job['file'] for job in report] + [
+        save_table(similarity.rename_axis('Crime type').reset_index(), options.output, f'{name}_fingerprint_similarity.csv')]
+
+
+def hotspot_cells_stage(crime_df, options):
+    # Gi* hot spots of every crime type on 250m cells, one study area per force.
+    hot_cells, clusters = [], []
+    for force, force_df in crime_df.groupby('Falls within', observed=True):
+        index = HotspotIndex.from_grid(force_df['Longitude'], force_df['Latitude'], cell_size=250)
+        hotspots = detect_hotspots(force_df, index, by='Crime type')
+        hot = hotspots[hotspots['Hotspot'] == HOT_SPOT]
+        hot_cells.append(hot.assign(**{'Falls within': force}))
+        clusters.append(hotspot_clusters(hot, 'Crime type').assign(**{'Falls within': force}))
+    hot_cells = pd.concat(hot_cells, ignore_index=True) if hot_cells else pd.DataFrame(columns=HOT_CELL_COLUMNS)
+    clusters = pd.concat(clusters, ignore_index=True) if clusters else pd.DataFrame(columns=HOTSPOT_COLUMNS)
+    return [save_table(hot_cells, options.output, 'hotspot_cells.csv'),
+            save_table(clusters, options.output, 'hotspots.csv')]
+
+
+def rolling_rates_stage(crime_df, options):
+    # Rolling 3, 12 and 24-month rates, and the last 12 months against the 12 before.
+    time_index = options.time_index
+    rates = rolling_rate_table(time_index, analysis.population_data)
+    recent = time_index.months[-min(12, time_index.span_months):]
+    last_year = time_index.compare(recent[0], recent[-1], by=['Falls within', 'Crime type'])
+    return [save_table(rates, options.output, 'rolling_rates.csv'),
+            save_table(last_year.reset_index(), options.output, 'last_12_months_change.csv')]
+
+
+STAGES = {
+    'top-crimes': top_crimes_stage,
+    'crime-rate': crime_rate_stage,
+    'rolling-rates': rolling_rates_stage,
+    'seasonality': seasonality_stage,
+    'unsolved-rate': unsolved_rate_stage,
+    'priority-matrix': priority_matrix_stage,
+    'theft-hotspot': theft_hotspot_stage,
+    'fingerprint': fingerprint_stage,
+    'hotspot-cells': hotspot_cells_stage,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run every crime analysis on one load of the data.')
+    parser.add_argument('--data', default=main_folder_path, help='folder with the police.uk CSV files')
+    parser.add_argument('--output', default='report', help='folder for the figures and tables')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+                        help='stages to run (default: all)')
+    parser.add_argument('--region', default='Oxford',
+                        help='region of the priority matrix, theft hotspot and fingerprint stages')
+    parser.add_argument('--workers', type=int, default=load_workers, help='processes used to parse the CSV files')
+    parser.add_argument('--render-workers', type=int, default=render_workers, help='processes used to draw the hotspot maps')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--tables-only', action='store_true', default=plots.compute_only,
+                        help='only write the tables, without drawing any figure (default with CRIME_COMPUTE_ONLY=1)')
+    parser.add_argument('--trace', help='write a JSON trace of every stage to this file (see instrument.py)')
+    parser.add_argument('--profile', help='cProfile the stage with this name')
+    return parser.parse_args(argv)
+
+
+def run_report(options):
+    """Loads the data once and runs the selected stages. Returns the seconds each stage took."""
+    os.makedirs(options.output, exist_ok=True)
+
+    # --- Part 1 & 2: Loading and Cleaning Data (once for every stage) ---
+    print(f"Loading and cleaning data from: {options.data}...")
+    start = time.perf_counter()
+    with stage('load') as record:
+        crime_df = load_crimes_with_outcomes(options.data, columns=ANALYSIS_COLUMNS, workers=options.workers)
+        options.index = build_spatial_index(crime_df)
+        options.time_index = TimeIndex.from_frame(crime_df)
+        record.rows_out = len(crime_df)
+    timings = {'load': time.perf_counter() - start}
+    print(f"Loaded {len(crime_df)} crimes in {timings['load']:.1f}s.")
+
+    # --- Part 3 & 4: Every Analysis on the Shared Frame ---
+    for name in options.stages:
+        print(f"\nRunning stage '{name}'...")
+        start = time.perf_counter()
+        with stage(name, len(crime_df)) as record:
+            files = STAGES[name](crime_df, options)
+            record.rows_out = len(files)
+        timings[name] = time.perf_counter() - start
+        for file in files:
+            print(f" -> saved '{file}'")
+        print(f"Stage '{name}' finished in {timings[name]:.1f}s.")
+    return timings
+
+
+# The fingerprint maps can be drawn on a process pool, so the report must only
+# run in the main process.
+if __name__ == '__main__':
+    options = parse_args()
+    if options.trace or options.profile:
+        enable_tracing(options.trace, options.profile)
+    try:
+        timings = run_report(options)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit()
+    print(f"\nProcess finished in {sum(timings.values()):.1f}s. The report is in '{options.output}'.")
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from instrument import traced
+
+# Seasonality of every force and crime type at once.
+# Counts are held as one dense (force, crime type, year, month) array, built
+# with a single bincount. Average monthly profiles, rates per 100k people,
+# seasonal indices and year-over-year changes of every combination are then
+# plain array operations, and come out as one long table.
+#
+#   cube = SeasonalityCube.from_frame(crime_df)
+#   cube.table(population_data).to_csv('seasonality.csv', index=False)
+
+MONTHS = 12
+
+
+def _factorize(values):
+    """Integer codes and string labels; categoricals reuse their codes instead of re-hashing rows."""
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.astype(str)
+    codes, labels = pd.factorize(values, sort=True)
+    return codes, pd.Index(labels).astype(str)
+
+
+class SeasonalityCube:
+    """Crime counts per force, crime type, year and calendar month.
+
+    `observed` marks the (year, month) slots the data covers, so months before
+    the first or after the last file are not averaged in as zeros.
+    """
+
+    def __init__(self, forces, crime_types, years, counts, observed):
+        self.forces = pd.Index(forces, name='Falls within')
+        self.crime_types = pd.Index(crime_types, name='Crime type')
+        self.years = pd.Index(years, name='Year')
+        self.counts = counts
+        self.observed = observed
+
+    @classmethod
+    def _build(cls, forces, crime_types, months, weights=None):
+        force_codes, force_labels = _factorize(forces)
+        type_codes, type_labels = _factorize(crime_types)
+        months = pd.DatetimeIndex(months)
+        first_year = months.year.min() if len(months) else 0
+        years = np.arange(first_year, months.year.max() + 1) if len(months) else np.array([], dtype=int)
+        year_codes = np.asarray(months.year - first_year)
+        month_codes = np.asarray(months.month - 1)
+
+        shape = (len(force_labels), len(type_labels), len(years), MONTHS)
+        keep = (force_codes >= 0) & (type_codes >= 0) & ~np.asarray(months.isna())
+        cells = np.ravel_multi_index((force_codes[keep], type_codes[keep], year_codes[keep], month_codes[keep]), shape)
+        weights = None if weights is None else np.asarray(weights, dtype=float)[keep]
+        counts = np.bincount(cells, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
+
+        observed = np.zeros((len(years), MONTHS), dtype=bool)
+        observed[year_codes[keep], month_codes[keep]] = True
+        return cls(force_labels, type_labels, years, counts.astype(float), observed)
+
+    @classmethod
+    @traced('seasonality_cube')
+    def from_frame(cls, crime_df):
+        """Counts the rows of a crime_df with 'Falls within', 'Crime type' and 'Month'."""
+        return cls._build(crime_df['Falls within'], crime_df['Crime type'], crime_df['Month'])
+
+    @classmethod
+    def from_counts(cls, monthly_counts):
+        """From counts indexed by ('Falls within', 'Crime type', 'Month'), e.g. CrimeCube.query()."""
+        index = monthly_counts.index
+        return cls._build(index.get_level_values('Falls within'), index.get_level_values('Crime type'),
+                          index.get_level_values('Month'), monthly_counts.to_numpy())
+
+    def profiles(self):
+        """Average count in each calendar month over the observed years, as (force, type, 12)."""
+        years_observed = self.observed.sum(axis=0)
+        totals = self.counts.sum(axis=2)
+        return np.divide(totals, years_observed, out=np.full(totals.shape, np.nan), where=years_observed > 0)
+
+    def rates(self, population, per=100000):
+        """Average monthly counts per `per` people, for a {force: population} mapping."""
+        people = self.forces.map(lambda force: population.get(force, np.nan)).to_numpy(dtype=float)
+        return self.profiles() / people[:, None, None] * per
+
+    def seasonal_index(self):
+        """Each month's average count over the mean month of its force and crime type (1 = typical)."""
+        profiles = self.profiles()
+        months_seen = max(self.observed.any(axis=0).sum(), 1)
+        mean = np.nansum(profiles, axis=2, keepdims=True) / months_seen
+        return np.divide(profiles, mean, out=np.full(profiles.shape, np.nan), where=mean > 0)
+
+    def yoy_deltas(self):
+        """Change of every month's count from the same month a year earlier, as (force, type, year, 12).
+
+        The first year, and months without data in either year, are NaN.
+        """
+        deltas = np.full(self.counts.shape, np.nan)
+        both = self.observed[1:] & self.observed[:-1]
+        change = self.counts[:, :, 1:] - self.counts[:, :, :-1]
+        deltas[:, :, 1:] = np.where(both, change, np.nan)
+        return deltas
+
+    def _present(self):
+        """Flat mask of the (force, crime type) combinations with at least one crime."""
+        return self.counts.sum(axis=(2, 3)).reshape(-1) > 0
+
+    def _frame(self, values, extra_levels=()):
+        """Long table of an (force, type, ..., month) array, one column per array."""
+        levels = [self.forces, self.crime_types] + list(extra_levels) + [pd.RangeIndex(1, MONTHS + 1, name='Month_Num')]
+        index = pd.MultiIndex.from_product(levels)
+        return pd.DataFrame({name: array.reshape(-1) for name, array in values.items()}, index=index).reset_index()
+
+    def table(self, population=None):
+        """Average count, rate per 100k and seasonal index of every force, crime type and month.
+
+        Combinations without any crime are left out. Matches the columns of
+        analysis.seasonal_rates(), plus 'Seasonal Index'.
+        """
+        values = {'Count': self.profiles()}
+        if population is not None:
+            people = self.forces.map(lambda force: population.get(force, np.nan)).to_numpy(dtype=float)
+            values['Population'] = np.broadcast_to(people[:, None, None], values['Count'].shape)
+            values['Avg Monthly Rate per 100k'] = self.rates(population)
+        values['Seasonal Index'] = self.seasonal_index()
+        table = self._frame(values)
+        present = np.repeat(self._present(), MONTHS)
+        return table[present & table['Count'].notna().to_numpy()].reset_index(drop=True)
+
+    def yoy_table(self):
+        """Count, count a year earlier and change of every force, crime type, year and month with data."""
+        previous = np.full(self.counts.shape, np.nan)
+        previous[:, :, 1:] = self.counts[:, :, :-1]
+        deltas = self.yoy_deltas()
+        table = self._frame({
+            'Count': self.counts,
+            'Previous Year Count': previous,
+            'YoY Change': deltas,
+            'YoY Change (%)': np.divide(deltas * 100, previous, out=np.full(deltas.shape, np.nan),
+                                        where=~np.isnan(deltas) & (previous > 0)),
+        }, [self.years])
+        present = np.repeat(self._present(), len(self.years) * MONTHS)
+        return table[present & table['YoY Change'].notna().to_numpy()].reset_index(drop=True)
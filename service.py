@@ -0,0 +1,362 @@
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, urlencode
+from urllib.request import urlopen
+from urllib.error import HTTPError
+import pandas as pd
+from loader import ANALYSIS_COLUMNS, cache_folder_path, load_workers, main_folder_path
+from tables import load_crimes_with_outcomes
+from regions import build_spatial_index, select_region
+from streaming import unsolved_rates
+from timeindex import TimeIndex
+from seasonality import SeasonalityCube
+from hotspot_detection import HOT_SPOT, HotspotIndex, detect_hotspots
+import analysis
+
+# Local HTTP/JSON query service over the analysis engines.
+# The data is loaded once, with the time index, seasonality cube and spatial
+# index built up front, so every request is a lookup or a small computation.
+# Requests are served by an asyncio server; computations run on a thread pool
+# and their JSON answers are kept in a bounded LRU cache keyed by the
+# normalized query parameters (defaults filled in, lists sorted, months as
+# YYYY-MM), so equivalent queries share one entry.
+#
+#   python service.py --port 8765
+#   python service.py --get '/unsolved-rate?crime_type=Burglary'
+#
+#   GET /health
+#   GET /rates?force=...&crime_type=...&start=YYYY-MM&end=YYYY-MM&window=12
+#   GET /unsolved-rate?force=...&crime_type=...&start=...&end=...&by=Falls within,Crime type
+#   GET /seasonality?force=...&crime_type=...&table=profiles|yoy
+#   GET /priority-matrix?region=Oxford  or  ?level=LSOA&area=E01028522
+#   GET /hotspots?force=...&crime_type=...&cell_size=250&alpha=0.05
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+
+
+class LRUCache:
+    """A bounded mapping that drops the least recently used entry when full."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+# --- Query parameters ---
+
+def _text(values):
+    return values[-1].strip()
+
+
+def _labels(values):
+    """Repeated and comma-separated values as one sorted tuple."""
+    labels = {label.strip() for value in values for label in value.split(',') if label.strip()}
+    return tuple(sorted(labels))
+
+
+def _columns(values):
+    """Like _labels, but the order matters (it is the order of the group columns)."""
+    return tuple(label.strip() for value in values for label in value.split(',') if label.strip())
+
+
+def _month(values):
+    return pd.Timestamp(_text(values)).strftime('%Y-%m')
+
+
+def _int(values):
+    return int(_text(values))
+
+
+def _float(values):
+    return float(_text(values))
+
+
+class CrimeService:
+    """The loaded data and its indexes, answering the service's queries as DataFrames."""
+
+    def __init__(self, crime_df):
+        self.crime_df = crime_df
+        self.spatial_index = build_spatial_index(crime_df)
+        self.time_index = TimeIndex.from_frame(crime_df)
+        self.seasonality = SeasonalityCube.from_frame(crime_df)
+        self.seasonal_tables = {'profiles': self.seasonality.table(analysis.population_data),
+                                'yoy': self.seasonality.yoy_table()}
+        self.priority_table = analysis.priority_table(crime_df)
+        # Hotspot grids of every force at the default cell size; other sizes are built on demand.
+        self.force_frames = {str(force): force_df for force, force_df in crime_df.groupby('Falls within', observed=True)}
+        self.hotspot_indexes = {(force, 250): HotspotIndex.from_grid(force_df['Longitude'], force_df['Latitude'], 250)
+                                for force, force_df in self.force_frames.items()}
+        self.lock = threading.Lock()
+        # endpoint: (method, {parameter: (parser, default)})
+        self.endpoints = {
+            '/health': (self.health, {}),
+            '/rates': (self.rates, {
+                'force': (_labels, ()), 'crime_type': (_labels, ()), 'start': (_month, None),
+                'end': (_month, None), 'window': (_int, None), 'per': (_int, 1000)}),
+            '/unsolved-rate': (self.unsolved_rate, {
+                'force': (_labels, ()), 'crime_type': (_labels, ()), 'start': (_month, None),
+                'end': (_month, None), 'by': (_columns, ('Falls within', 'Crime type'))}),
+            '/seasonality': (self.seasonal_profiles, {
+                'force': (_labels, ()), 'crime_type': (_labels, ()), 'table': (_text, 'profiles')}),
+            '/priority-matrix': (self.priority_matrix, {
+                'region': (_text, None), 'area': (_text, None), 'level': (_text, None)}),
+            '/hotspots': (self.hotspots, {
+                'force': (_text, None), 'crime_type': (_labels, ()), 'cell_size': (_int, 250),
+                'alpha': (_float, 0.05)}),
+        }
+
+    @classmethod
+    def from_folder(cls, folder_path=main_folder_path, cache_dir=cache_folder_path, workers=load_workers):
+        return cls(load_crimes_with_outcomes(folder_path, ANALYSIS_COLUMNS, cache_dir, workers))
+
+    def normalize(self, endpoint, query):
+        """Known parameters with defaults filled in, or ValueError/KeyError for bad queries."""
+        if endpoint not in self.endpoints:
+            raise KeyError(f"Unknown endpoint '{endpoint}'. Use one of {sorted(self.endpoints)}.")
+        spec = self.endpoints[endpoint][1]
+        unknown = set(query) - set(spec)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) {sorted(unknown)} for '{endpoint}'. Use {sorted(spec)}.")
+        return {name: parser(query[name]) if name in query else default for name, (parser, default) in spec.items()}
+
+    def answer(self, endpoint, params):
+        return self.endpoints[endpoint][0](**params)
+
+    # --- Endpoints ---
+
+    @staticmethod
+    def _where(force, crime_type):
+        where = {}
+        if force:
+            where['Falls within'] = list(force)
+        if crime_type:
+            where['Crime type'] = list(crime_type)
+        return where
+
+    def health(self):
+        return pd.DataFrame([{'Rows': len(self.crime_df), 'Period': self.time_index.period_label(),
+                              'Months': self.time_index.span_months}])
+
+    def rates(self, force, crime_type, start, end, window, per):
+        """Annual crimes per `per` people of each force over [start, end] or the last `window` months."""
+        if window is not None:
+            last = self.time_index.months[-1] if end is None else pd.Timestamp(end)
+            start = (last - pd.DateOffset(months=window - 1)).strftime('%Y-%m')
+            end = last.strftime('%Y-%m')
+        counts = self.time_index.annualized(start, end, by='Falls within', where=self._where(force, crime_type))
+        rates = counts.rename('Annual Crimes').reset_index()
+        rates['Falls within'] = rates['Falls within'].astype(str)
+        rates['Population'] = rates['Falls within'].map(analysis.population_data)
+        rates[f'Annual Rate per {per}'] = rates['Annual Crimes'] / rates['Population'] * per
+        return rates
+
+    def unsolved_rate(self, force, crime_type, start, end, by):
+        if not by or 'Last outcome category' in by:
+            raise ValueError("by needs at least one column other than 'Last outcome category'.")
+        counts = self.time_index.counts(start, end, by=list(by) + ['Last outcome category'],
+                                        where=self._where(force, crime_type))
+        return unsolved_rates(counts, analysis.UNSOLVED_CATEGORY, by)
+
+    def seasonal_profiles(self, force, crime_type, table):
+        if table not in self.seasonal_tables:
+            raise ValueError(f"Unknown table '{table}'. Use one of {sorted(self.seasonal_tables)}.")
+        rows = self.seasonal_tables[table]
+        if force:
+            rows = rows[rows['Falls within'].isin(force)]
+        if crime_type:
+            rows = rows[rows['Crime type'].isin(crime_type)]
+        return rows
+
+    def priority_matrix(self, region, area, level):
+        if area is not None:
+            return analysis.area_priority(self.priority_table, area, level)
+        region_df = select_region(self.crime_df, region or 'Oxford', self.spatial_index)
+        return analysis.priority_matrix(region_df)
+
+    def hotspots(self, force, crime_type, cell_size, alpha):
+        if force is None:
+            raise ValueError("'force' is required, e.g. force=Thames Valley Police.")
+        if force not in self.force_frames:
+            raise KeyError(f"No crimes of force '{force}'.")
+        force_df = self.force_frames[force]
+        with self.lock:
+            key = (force, cell_size)
+            if key not in self.hotspot_indexes:
+                self.hotspot_indexes[key] = HotspotIndex.from_grid(
+                    force_df['Longitude'], force_df['Latitude'], cell_size=cell_size)
+            index = self.hotspot_indexes[key]
+        if crime_type:
+            force_df = force_df[force_df['Crime type'].isin(crime_type)]
+        hotspots = detect_hotspots(force_df, index, by='Crime type', alpha=alpha)
+        return hotspots[hotspots['Hotspot'] == HOT_SPOT].reset_index(drop=True)
+
+
+class CrimeServer:
+    """asyncio HTTP front end of a CrimeService with an LRU cache of encoded answers."""
+
+    def __init__(self, service, cache_size=CACHE_SIZE, threads=4):
+        self.service = service
+        self.cache = LRUCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        # Identical queries that arrive while one is computing wait for it.
+        self.pending = {}
+
+    def _compute(self, endpoint, params):
+        start = time.perf_counter()
+        result = self.service.answer(endpoint, params)
+        body = {'endpoint': endpoint, 'params': params, 'seconds': round(time.perf_counter() - start, 6),
+                'rows': json.loads(result.to_json(orient='records', date_format='iso'))}
+        return json.dumps(body).encode()
+
+    async def respond(self, method, target):
+        """(status, JSON body bytes, cache state) of one request."""
+        if method != 'GET':
+            return 405, json.dumps({'error': 'Only GET is supported.'}).encode(), None
+        url = urlsplit(target)
+        endpoint = url.path.rstrip('/') or '/health'
+        try:
+            params = self.service.normalize(endpoint, parse_qs(url.query))
+        except KeyError as e:
+            return 404, json.dumps({'error': e.args[0]}).encode(), None
+        except ValueError as e:
+            return 400, json.dumps({'error': str(e)}).encode(), None
+        if endpoint == '/health':
+            # Never cached: reports the cache itself.
+            body = json.loads(self._compute(endpoint, params))
+            return 200, json.dumps(dict(body, cache=self.cache.stats())).encode(), None
+
+        key = (endpoint, json.dumps(params, sort_keys=True))
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, body, 'hit'
+        if key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[key] = loop.run_in_executor(self.executor, self._compute, endpoint, params)
+        try:
+            body = await self.pending[key]
+        except (KeyError, ValueError) as e:
+            return 400, json.dumps({'error': str(e.args[0] if e.args else e)}).encode(), None
+        finally:
+            self.pending.pop(key, None)
+        self.cache.put(key, body)
+        return 200, body, 'miss'
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # Headers are not needed.
+            parts = request_line.split(' ')
+            if len(parts) < 2:
+                status, body, cached = 400, json.dumps({'error': 'Malformed request.'}).encode(), None
+            else:
+                status, body, cached = await self.respond(parts[0], parts[1])
+        except Exception as e:
+            status, body, cached = 500, json.dumps({'error': f'{type(e).__name__}: {e}'}).encode(), None
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}.get(status, 'Error')
+        headers = [f'HTTP/1.1 {status} {reason}', 'Content-Type: application/json',
+                   f'Content-Length: {len(body)}', 'Connection: close']
+        if cached:
+            headers.append(f'X-Cache: {cached}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """Serves from a daemon thread (port 0 picks a free port) and returns the port."""
+        ready = threading.Event()
+        threading.Thread(target=lambda: asyncio.run(self.serve(host, port, ready)), daemon=True).start()
+        ready.wait()
+        return self.port
+
+
+class ServiceClient:
+    """Minimal stand-in client of the service, for scripts and tests."""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=60):
+        self.base_url = f'http://{host}:{port}'
+        self.timeout = timeout
+
+    def get(self, endpoint, **params):
+        """Answer of an endpoint as a dict; lists become repeated parameters."""
+        query = urlencode({name.replace('-', '_'): value for name, value in params.items()}, doseq=True)
+        url = f"{self.base_url}/{endpoint.lstrip('/')}" + (f'?{query}' if query else '')
+        try:
+            with urlopen(url, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            raise ValueError(json.loads(e.read()).get('error', str(e))) from None
+
+    def frame(self, endpoint, **params):
+        """Answer of an endpoint as a DataFrame."""
+        return pd.DataFrame(self.get(endpoint, **params)['rows'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the crime analyses as a local HTTP/JSON service.')
+    parser.add_argument('--data', default=main_folder_path, help='folder with the police.uk CSV files')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='answers kept in the LRU cache')
+    parser.add_argument('--threads', type=int, default=4, help='threads computing uncached answers')
+    parser.add_argument('--workers', type=int, default=load_workers, help='processes used to parse the CSV files')
+    parser.add_argument('--get', metavar='PATH', help="query a running service instead, e.g. '/rates?window=12'")
+    options = parser.parse_args()
+
+    if options.get:
+        try:
+            print(json.dumps(ServiceClient(options.host, options.port).get(options.get), indent=1))
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}")
+        exit()
+
+    print(f"Loading and cleaning data from: {options.data}...")
+    try:
+        service = CrimeService.from_folder(options.data, workers=options.workers)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit()
+    print(f"Loaded {len(service.crime_df)} crimes ({service.time_index.period_label()}).")
+    print(f"Serving on http://{options.host}:{options.port} (Ctrl+C to stop)...")
+    try:
+        asyncio.run(CrimeServer(service, options.cache_size, options.threads).serve(options.host, options.port))
+    except KeyboardInterrupt:
+        print("\nService stopped.")
@@ -0,0 +1,94 @@
+import os
+from collections import Counter
+import pandas as pd
+from loader import find_csv_files
+from instrument import traced
+
+# Constant-memory grouped counts over the street CSVs.
+# The files are read in chunks and only the running counts are kept, so peak
+# memory depends on the chunk size, not on the number of rows.
+
+# Set CRIME_STREAMING=1 to have main.py, rate.py and type.py count while reading.
+streaming_mode = os.environ.get('CRIME_STREAMING') == '1'
+
+# Stand-in for missing labels while counting (NaN keys never compare equal).
+_MISSING = '\0'
+
+
+def _add_counts(counter, frame, by):
+    counts = frame[by].fillna(_MISSING).groupby(by, observed=True).size()
+    for key, count in counts.items():
+        counter[key if isinstance(key, tuple) else (key,)] += count
+
+
+def _counts_to_series(counter, by):
+    keys = pd.DataFrame(list(counter), columns=by, dtype=object)
+    keys = keys.mask(keys == _MISSING)
+    if 'Month' in by:
+        keys['Month'] = pd.to_datetime(keys['Month'], format='%Y-%m')
+    keys['Count'] = pd.Series(list(counter.values()), dtype='int64')
+    return keys.set_index(by)['Count'].sort_index()
+
+
+@traced('count_crimes')
+def count_crimes(crime_df, by):
+    """Counts the rows of an in-memory crime_df per combination of the `by` columns."""
+    counts = crime_df.groupby(list(by), observed=True, dropna=False).size().rename('Count')
+    return counts[counts > 0].sort_index()
+
+
+@traced('stream_counts')
+def stream_counts(folder_path, by, chunksize=250000):
+    """Counts crimes per combination of the `by` columns, reading the CSVs in chunks.
+
+    Rows without coordinates are skipped, like in the cleaned crime_df, so the
+    result matches count_crimes(load_crime_data(folder_path), by).
+    """
+    by = list(by)
+    all_csv_files = find_csv_files(folder_path)
+    if not all_csv_files:
+        raise FileNotFoundError(f"No CSV files found in '{folder_path}'.")
+
+    read_columns = by + [c for c in ('Longitude', 'Latitude') if c not in by]
+    counter = Counter()
+    for file in all_csv_files:
+        chunks = pd.read_csv(
+            file,
+            usecols=read_columns,
+            dtype={c: str for c in by},
+            chunksize=chunksize,
+        )
+        for chunk in chunks:
+            _add_counts(counter, chunk.dropna(subset=['Longitude', 'Latitude']), by)
+    return _counts_to_series(counter, by)
+
+
+def force_totals(counts):
+    """Total crimes per force, largest first (same as crime_df['Falls within'].value_counts())."""
+    return counts.groupby(level='Falls within').sum().sort_values(ascending=False)
+
+
+def top_crimes_per_force(counts, n=5):
+    """The n most frequent crime types of each force, as an Index per force."""
+    per_type = counts.groupby(level=['Falls within', 'Crime type']).sum()
+    return per_type.groupby(level='Falls within').apply(
+        lambda x: x.sort_values(ascending=False).head(n).index.get_level_values('Crime type')
+    )
+
+
+def unsolved_rates(counts, unsolved_category, by=('Falls within', 'Crime type')):
+    """Total, unsolved and unsolved rate per combination of `by` (by default the type.py table).
+
+    counts is indexed by the `by` columns and 'Last outcome category', e.g.
+    from count_crimes(), CrimeCube.query() or TimeIndex.counts(). Groups
+    without any crime are left out.
+    """
+    keys = list(by)
+    total = counts.groupby(level=keys).sum()
+    outcome = counts.index.get_level_values('Last outcome category')
+    unsolved = counts[outcome == unsolved_category].groupby(level=keys).sum()
+
+    outcome_df = pd.DataFrame({'Total': total, 'Unsolved': unsolved}).fillna(0)
+    outcome_df = outcome_df[outcome_df['Total'] > 0]
+    outcome_df['Unsolved Rate (%)'] = (outcome_df['Unsolved'] / outcome_df['Total']) * 100
+    return outcome_df.reset_index()
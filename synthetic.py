@@ -0,0 +1,318 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from loader import CRIME_TYPES
+
+# Seeded generator of synthetic police.uk street data.
+# Writes <YYYY-MM>/<YYYY-MM>-<force>-street.csv files with the real columns,
+# so every script and benchmark can run without the original data. Crimes are
+# clustered around each force's towns (commercial crimes tightly around the
+# centres, residential ones more spread out), crime types and outcomes follow
+# skewed national-like shares, and monthly volumes have a summer peak. With
+# --outcomes the later outcomes of open investigations are written as
+# <force>-outcomes.csv files, next to a few <force>-stop-and-search.csv files.
+#
+#   python synthetic.py --rows 6M --output /tmp/crime_6M
+
+STREET_COLUMNS = [
+    'Crime ID', 'Month', 'Reported by', 'Falls within', 'Longitude', 'Latitude',
+    'Location', 'LSOA code', 'LSOA name', 'Crime type', 'Last outcome category', 'Context'
+]
+
+# The benchmark sizes; the first one is about the size of the real data.
+DATASET_SIZES = {'600k': 600_000, '6M': 6_000_000, '60M': 60_000_000}
+
+# For every force: file slug, population, bounding box and (town, lon, lat, weight).
+FORCES = {
+    'Thames Valley Police': {
+        'slug': 'thames-valley', 'population': 2340000,
+        'lon_bounds': (-1.60, -0.50), 'lat_bounds': (51.30, 52.10),
+        'towns': [('Oxford', -1.257, 51.752, 0.30), ('Reading', -0.973, 51.454, 0.25),
+                  ('Milton Keynes', -0.759, 52.040, 0.20), ('Slough', -0.595, 51.510, 0.12),
+                  ('High Wycombe', -0.749, 51.628, 0.08), ('Banbury', -1.340, 52.062, 0.05)],
+    },
+    'Cambridgeshire Constabulary': {
+        'slug': 'cambridgeshire', 'population': 678600,
+        'lon_bounds': (-0.50, 0.50), 'lat_bounds': (52.00, 52.75),
+        'towns': [('Cambridge', 0.121, 52.205, 0.45), ('Peterborough', -0.240, 52.573, 0.35),
+                  ('Huntingdon', -0.186, 52.330, 0.08), ('Ely', 0.262, 52.399, 0.07),
+                  ('Wisbech', 0.160, 52.666, 0.05)],
+    },
+    'Metropolitan Police Service': {
+        'slug': 'metropolitan', 'population': 9000000,
+        'lon_bounds': (-0.50, 0.30), 'lat_bounds': (51.28, 51.70),
+        'towns': [('Westminster', -0.135, 51.497, 0.25), ('Camden', -0.142, 51.550, 0.15),
+                  ('Newham', -0.003, 51.541, 0.15), ('Lambeth', -0.114, 51.462, 0.15),
+                  ('Croydon', -0.098, 51.372, 0.12), ('Ealing', -0.304, 51.513, 0.10),
+                  ('Enfield', -0.080, 51.652, 0.08)],
+    },
+}
+
+# Approximate national shares of each crime type.
+CRIME_TYPE_SHARES = {
+    'Violence and sexual offences': 0.33, 'Anti-social behaviour': 0.17,
+    'Criminal damage and arson': 0.08, 'Shoplifting': 0.07, 'Other theft': 0.06,
+    'Vehicle crime': 0.06, 'Public order': 0.06, 'Burglary': 0.04, 'Drugs': 0.03,
+    'Other crime': 0.02, 'Theft from the person': 0.02, 'Bicycle theft': 0.02,
+    'Robbery': 0.015, 'Possession of weapons': 0.01,
+}
+
+# Spread (degrees) of each crime type around the town centres.
+COMMERCIAL_CRIMES = ['Shoplifting', 'Theft from the person', 'Bicycle theft', 'Public order', 'Other theft']
+RESIDENTIAL_CRIMES = ['Burglary', 'Vehicle crime', 'Criminal damage and arson']
+CRIME_SPREAD = {crime_type: 0.006 if crime_type in COMMERCIAL_CRIMES else
+                0.025 if crime_type in RESIDENTIAL_CRIMES else 0.015 for crime_type in CRIME_TYPES}
+
+# Outcome shares; thefts are more often closed without a suspect.
+OUTCOME_SHARES = {
+    'Investigation complete; no suspect identified': 0.35,
+    'Unable to prosecute suspect': 0.25,
+    'Under investigation': 0.12,
+    'Status update unavailable': 0.08,
+    'Further investigation is not in the public interest': 0.05,
+    'Awaiting court outcome': 0.05,
+    'Offender given a caution': 0.03,
+    'Local resolution': 0.03,
+    'Court result unavailable': 0.02,
+    'Action to be taken by another organisation': 0.02,
+}
+THEFT_UNSOLVED_SHARE = 0.65
+UNSOLVED_CATEGORY = 'Investigation complete; no suspect identified'
+
+OUTCOME_COLUMNS = [
+    'Crime ID', 'Month', 'Reported by', 'Falls within', 'Longitude', 'Latitude',
+    'Location', 'LSOA code', 'LSOA name', 'Outcome type'
+]
+# Street outcomes that are later updated in the outcomes files, and the final outcomes.
+OPEN_OUTCOMES = ['Under investigation', 'Awaiting court outcome', 'Status update unavailable']
+FINAL_OUTCOME_SHARES = {
+    UNSOLVED_CATEGORY: 0.45,
+    'Unable to prosecute suspect': 0.25,
+    'Suspect charged': 0.15,
+    'Offender given a caution': 0.08,
+    'Local resolution': 0.07,
+}
+
+STOP_SEARCH_COLUMNS = [
+    'Type', 'Date', 'Part of a policing operation', 'Policing operation', 'Latitude', 'Longitude',
+    'Gender', 'Age range', 'Self-defined ethnicity', 'Officer-defined ethnicity', 'Legislation',
+    'Object of search', 'Outcome', 'Outcome linked to object of search',
+    'Removal of more than just outer clothing'
+]
+# Stop and searches per 1000 street crimes.
+STOP_SEARCH_RATE = 40
+
+STREETS = ['High Street', 'Station Road', 'Church Lane', 'Park Road', 'London Road', 'Victoria Road',
+           'Green Lane', 'Mill Lane', 'Queen Street', 'Shopping Area', 'Supermarket', 'Parking Area',
+           'Petrol Station', 'Nightclub', 'Sports/Recreation Area', 'Hospital']
+
+# Share of crimes without a location (blank coordinates, like police.uk).
+NO_LOCATION_SHARE = 0.015
+# Share of crimes spread evenly over the force area rather than around a town.
+BACKGROUND_SHARE = 0.10
+# Size of a synthetic LSOA cell in degrees.
+LSOA_CELL = 0.01
+
+
+def parse_size(size):
+    """Number of rows for '600k', '6M', '60M' or a plain number."""
+    if size in DATASET_SIZES:
+        return DATASET_SIZES[size]
+    size = str(size).strip().upper()
+    for suffix, factor in (('K', 1_000), ('M', 1_000_000)):
+        if size.endswith(suffix):
+            return int(float(size[:-1]) * factor)
+    return int(size)
+
+
+def month_range(start='2023-05', months=24):
+    return [str(p) for p in pd.period_range(start, periods=months, freq='M')]
+
+
+def _normalized(shares, keys):
+    weights = np.array([shares.get(key, 0.0) for key in keys], dtype=float)
+    return weights / weights.sum()
+
+
+def _seasonal_weights(months):
+    """Relative volume of each month: about 15% above the mean in summer, below in winter."""
+    month_numbers = np.array([int(m[-2:]) for m in months])
+    weights = 1 + 0.15 * np.sin(2 * np.pi * (month_numbers - 4) / 12)
+    return weights / weights.sum()
+
+
+def _crime_ids(rng, n):
+    """64-character hex identifiers, like the ones police.uk publishes."""
+    digest = rng.bytes(32 * n).hex()
+    return [digest[i:i + 64] for i in range(0, 64 * n, 64)]
+
+
+def generate_street_file(rng, month, force, n):
+    """One synthetic street file (n rows) of a force for a month, as a DataFrame."""
+    spec = FORCES[force]
+    crime_types = np.array(CRIME_TYPES, dtype=object)
+    crime_type = crime_types[rng.choice(len(CRIME_TYPES), n, p=_normalized(CRIME_TYPE_SHARES, CRIME_TYPES))]
+
+    # Every crime belongs to a town; its distance from the centre depends on its type.
+    town_weights = np.array([town[3] for town in spec['towns']])
+    town = rng.choice(len(spec['towns']), n, p=town_weights / town_weights.sum())
+    spread = pd.Series(crime_type).map(CRIME_SPREAD).to_numpy(dtype=float)
+    lon = np.array([t[1] for t in spec['towns']])[town] + rng.normal(0, 1, n) * spread * 1.6
+    lat = np.array([t[2] for t in spec['towns']])[town] + rng.normal(0, 1, n) * spread
+
+    background = rng.random(n) < BACKGROUND_SHARE
+    lon[background] = rng.uniform(*spec['lon_bounds'], background.sum())
+    lat[background] = rng.uniform(*spec['lat_bounds'], background.sum())
+
+    # LSOAs are fixed cells of the map, named after the row's town.
+    cell_x = np.floor(lon / LSOA_CELL).astype(np.int64)
+    cell_y = np.floor(lat / LSOA_CELL).astype(np.int64)
+    cell = (cell_x * 7919 + cell_y * 104729) % 1000000
+    town_names = np.array([t[0] for t in spec['towns']], dtype=object)
+    lsoa_code = pd.Series(cell).map('E01{:06d}'.format).to_numpy(dtype=object)
+    lsoa_name = town_names[town] + ' ' + pd.Series(cell % 999 + 1).map('{:03d}'.format).to_numpy(dtype=object) \
+        + np.array(list('ABCDE'), dtype=object)[cell % 5]
+    location = 'On or near ' + np.array(STREETS, dtype=object)[(cell + cell_x) % len(STREETS)]
+
+    # Outcomes: skewed shares, more unsolved thefts, none for anti-social behaviour.
+    outcomes = list(OUTCOME_SHARES)
+    outcome = np.array(outcomes, dtype=object)[rng.choice(len(outcomes), n, p=_normalized(OUTCOME_SHARES, outcomes))]
+    is_theft = np.isin(crime_type, ['Shoplifting', 'Bicycle theft', 'Other theft', 'Theft from the person', 'Vehicle crime'])
+    outcome[is_theft & (rng.random(n) < THEFT_UNSOLVED_SHARE)] = UNSOLVED_CATEGORY
+    is_asb = crime_type == 'Anti-social behaviour'
+    outcome[is_asb] = None
+
+    crime_id = np.array(_crime_ids(rng, n), dtype=object)
+    crime_id[is_asb] = None
+
+    no_location = rng.random(n) < NO_LOCATION_SHARE
+    lon[no_location] = np.nan
+    lat[no_location] = np.nan
+    lsoa_code[no_location] = None
+    lsoa_name[no_location] = None
+    location[no_location] = 'No location'
+
+    return pd.DataFrame({
+        'Crime ID': crime_id,
+        'Month': month,
+        'Reported by': force,
+        'Falls within': force,
+        'Longitude': lon.round(6),
+        'Latitude': lat.round(6),
+        'Location': location,
+        'LSOA code': lsoa_code,
+        'LSOA name': lsoa_name,
+        'Crime type': crime_type,
+        'Last outcome category': outcome,
+        'Context': None,
+    }, columns=STREET_COLUMNS)
+
+
+def generate_outcome_updates(rng, street_df, months_left):
+    """Outcomes file rows for the open crimes of a street file, as {months later: DataFrame}.
+
+    Each open crime is closed 1-3 months later; a third of them first get an
+    intermediate 'Under investigation' row the month before.
+    """
+    open_df = street_df[street_df['Last outcome category'].isin(OPEN_OUTCOMES)]
+    delays = rng.integers(1, 4, len(open_df))
+    finals = list(FINAL_OUTCOME_SHARES)
+    final = np.array(finals, dtype=object)[rng.choice(len(finals), len(open_df),
+                                                      p=_normalized(FINAL_OUTCOME_SHARES, finals))]
+    intermediate = (rng.random(len(open_df)) < 1 / 3) & (delays > 1)
+    updates = {}
+    for delay in range(1, 4):
+        if delay > months_left:
+            break
+        rows = [open_df[delays == delay].assign(**{'Outcome type': final[delays == delay]}),
+                open_df[intermediate & (delays == delay + 1)].assign(**{'Outcome type': 'Under investigation'})]
+        updates[delay] = pd.concat(rows)[[c for c in OUTCOME_COLUMNS if c != 'Month']]
+    return updates
+
+
+def generate_stop_search_file(rng, month, force, n):
+    """One synthetic stop-and-search file of a force for a month, as a DataFrame."""
+    spec = FORCES[force]
+    days = rng.integers(0, 28, n)
+    seconds = rng.integers(0, 24 * 3600, n)
+    dates = pd.Timestamp(f'{month}-01', tz='UTC') + pd.to_timedelta(days, unit='D') + pd.to_timedelta(seconds, unit='s')
+    objects = np.array(['Controlled drugs', 'Offensive weapons', 'Stolen goods', 'Article for use in theft'], dtype=object)
+    outcomes = np.array(['A no further action disposal', 'Arrest', 'Community resolution'], dtype=object)
+    return pd.DataFrame({
+        'Type': 'Person search',
+        'Date': dates.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+        'Part of a policing operation': 'False',
+        'Policing operation': None,
+        'Latitude': rng.uniform(*spec['lat_bounds'], n).round(6),
+        'Longitude': rng.uniform(*spec['lon_bounds'], n).round(6),
+        'Gender': np.array(['Male', 'Female'], dtype=object)[(rng.random(n) < 0.12).astype(int)],
+        'Age range': np.array(['10-17', '18-24', '25-34', 'over 34'], dtype=object)[rng.integers(0, 4, n)],
+        'Self-defined ethnicity': None,
+        'Officer-defined ethnicity': None,
+        'Legislation': 'Misuse of Drugs Act 1971 (section 23)',
+        'Object of search': objects[rng.choice(len(objects), n, p=[0.6, 0.2, 0.12, 0.08])],
+        'Outcome': outcomes[rng.choice(len(outcomes), n, p=[0.7, 0.15, 0.15])],
+        'Outcome linked to object of search': None,
+        'Removal of more than just outer clothing': 'False',
+    }, columns=STOP_SEARCH_COLUMNS)
+
+
+def generate_crime_data(output_dir, rows=DATASET_SIZES['600k'], start='2023-05', months=24, seed=0,
+                        outcomes=False):
+    """Writes about `rows` synthetic crimes as police.uk street CSVs under output_dir.
+
+    Rows are split over the forces by population and over the months by
+    season. With outcomes=True the outcomes and stop-and-search files of every
+    month are written too. The same seed always writes the same files.
+    Returns the paths.
+    """
+    rng = np.random.default_rng(seed)
+    month_list = month_range(start, months)
+    forces = list(FORCES)
+    population = np.array([FORCES[force]['population'] for force in forces], dtype=float)
+    per_file = np.outer(_seasonal_weights(month_list), population / population.sum()) * rows
+    per_file = np.round(per_file).astype(np.int64)
+
+    paths = []
+    pending = {}
+    for i, month in enumerate(month_list):
+        month_dir = os.path.join(output_dir, month)
+        os.makedirs(month_dir, exist_ok=True)
+        for j, force in enumerate(forces):
+            slug = FORCES[force]['slug']
+            df = generate_street_file(rng, month, force, int(per_file[i, j]))
+            path = os.path.join(month_dir, f"{month}-{slug}-street.csv")
+            df.to_csv(path, index=False)
+            paths.append(path)
+            if not outcomes:
+                continue
+            for delay, updates in generate_outcome_updates(rng, df, len(month_list) - 1 - i).items():
+                pending.setdefault((i + delay, force), []).append(updates)
+            # This month's updates of earlier crimes, then the month's stop and searches.
+            updates = pd.concat(pending.pop((i, force), [pd.DataFrame(columns=OUTCOME_COLUMNS)]))
+            path = os.path.join(month_dir, f"{month}-{slug}-outcomes.csv")
+            updates.assign(Month=month)[OUTCOME_COLUMNS].to_csv(path, index=False)
+            paths.append(path)
+            path = os.path.join(month_dir, f"{month}-{slug}-stop-and-search.csv")
+            n_searches = int(per_file[i, j] * STOP_SEARCH_RATE / 1000)
+            generate_stop_search_file(rng, month, force, n_searches).to_csv(path, index=False)
+            paths.append(path)
+        print(f" -> {month}: {per_file[i].sum()} crimes written")
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic police.uk street CSVs.')
+    parser.add_argument('--output', required=True, help='folder for the CSV files')
+    parser.add_argument('--rows', default='600k', help="number of crimes: '600k', '6M', '60M' or a number")
+    parser.add_argument('--start', default='2023-05', help='first month (YYYY-MM)')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--outcomes', action='store_true', help='also write outcomes and stop-and-search files')
+    options = parser.parse_args()
+
+    print(f"Generating {parse_size(options.rows)} synthetic crimes in '{options.output}'...")
+    files = generate_crime_data(options.output, parse_size(options.rows), options.start, options.months, options.seed,
+                                options.outcomes)
+    print(f"\nProcess finished. {len(files)} files have been written.")
@@ -0,0 +1,161 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from instrument import traced
+from query import FORCE_FILE_SLUGS
+from loader import (main_folder_path, cache_folder_path, load_workers, ANALYSIS_COLUMNS,
+                    find_csv_files, concat_crime_frames, load_crime_data, map_files)
+
+# The outcomes and stop-and-search files of a police.uk download as their own
+# typed tables, and the join of the latest outcomes onto the street crimes.
+# Crime IDs (64 hex characters) are hashed to uint64 keys once, so the outcome
+# of every crime is found with one lookup in a hash index of the keys instead
+# of comparing strings. A street file only knows the outcome at the time it
+# was published; the outcomes files carry every later update.
+#
+#   crime_df = load_crimes_with_outcomes(main_folder_path)
+
+# Outcomes columns kept; location columns repeat the street file.
+OUTCOME_COLUMNS = ['Crime ID', 'Month', 'Outcome type']
+
+STOP_SEARCH_DTYPES = {
+    'Type': 'category',
+    'Part of a policing operation': 'category',
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+    'Gender': 'category',
+    'Age range': 'category',
+    'Self-defined ethnicity': 'category',
+    'Officer-defined ethnicity': 'category',
+    'Legislation': 'category',
+    'Object of search': 'category',
+    'Outcome': 'category',
+    'Outcome linked to object of search': 'category',
+    'Removal of more than just outer clothing': 'category',
+}
+
+_STOP_SEARCH_FILE = re.compile(r'^\d{4}-\d{2}-(.+)-stop-and-search\.csv$')
+# police.uk file slug -> 'Falls within' name, so stop-and-search rows use the street tables' force names.
+_FORCE_NAMES = {slug: force for force, slug in FORCE_FILE_SLUGS.items()}
+
+
+def crime_keys(crime_ids):
+    """uint64 hash of every Crime ID (0 for missing IDs, e.g. anti-social behaviour)."""
+    crime_ids = pd.Series(crime_ids)
+    present = crime_ids.notna().to_numpy()
+    keys = np.zeros(len(crime_ids), dtype=np.uint64)
+    keys[present] = pd.util.hash_array(crime_ids[present].astype(str).to_numpy(dtype=object))
+    return keys
+
+
+def read_outcomes_csv(file_path):
+    """Reads one outcomes file as Crime key, Outcome month and Outcome type."""
+    df = pd.read_csv(
+        file_path,
+        usecols=lambda c: c in OUTCOME_COLUMNS,
+        dtype={'Outcome type': 'category'},
+        parse_dates=['Month'],
+        date_format='%Y-%m',
+    )
+    df = df.dropna(subset=['Crime ID'])
+    return pd.DataFrame({
+        'Crime key': crime_keys(df['Crime ID']),
+        'Outcome month': df['Month'].to_numpy(),
+        'Outcome type': df['Outcome type'].array,
+    })
+
+
+def _stop_search_force(file_path, df):
+    """The 'Falls within' name of every row's force, from a 'Falls within' column or the
+    YYYY-MM-<force>-stop-and-search.csv name; missing when neither tells.
+    """
+    if 'Falls within' in df.columns:
+        return df['Falls within'].to_numpy()
+    match = _STOP_SEARCH_FILE.match(os.path.basename(file_path))
+    force = _FORCE_NAMES.get(match.group(1)) if match else None
+    return [force] * len(df)
+
+
+def read_stop_search_csv(file_path):
+    """Reads one stop-and-search file, typed like the street data."""
+    df = pd.read_csv(file_path, dtype=STOP_SEARCH_DTYPES)
+    df['Date'] = pd.to_datetime(df['Date'], utc=True, format='ISO8601')
+    df.insert(0, 'Force', pd.Categorical(_stop_search_force(file_path, df)))
+    return df.drop(columns='Falls within', errors='ignore')
+
+
+def _load_table(folder_path, schema, reader, workers, columns):
+    files = find_csv_files(folder_path, schema)
+    if not files:
+        return pd.DataFrame(columns=columns)
+    return concat_crime_frames(map_files(reader, files, workers))
+
+
+@traced('load_outcomes')
+def load_outcomes(folder_path=main_folder_path, workers=load_workers):
+    """Every outcomes file under folder_path as one table (empty if there are none)."""
+    return _load_table(folder_path, 'outcomes', read_outcomes_csv, workers,
+                       ['Crime key', 'Outcome month', 'Outcome type'])
+
+
+@traced('load_stop_searches')
+def load_stop_searches(folder_path=main_folder_path, workers=load_workers):
+    """Every stop-and-search file under folder_path as one table (empty if there are none)."""
+    return _load_table(folder_path, 'stop-and-search', read_stop_search_csv, workers,
+                       ['Force', 'Date'] + list(STOP_SEARCH_DTYPES))
+
+
+def latest_outcomes(outcomes_df):
+    """The most recent outcome of every crime: one row per Crime key."""
+    ordered = outcomes_df.sort_values('Outcome month', kind='stable')
+    return ordered.drop_duplicates('Crime key', keep='last').reset_index(drop=True)
+
+
+@traced('join_outcomes')
+def join_latest_outcomes(crime_df, outcomes_df):
+    """Updates crime_df's 'Last outcome category' with the latest outcome of every crime.
+
+    crime_df needs the 'Crime ID' column. Crimes listed more than once (e.g.
+    the same month downloaded twice) are kept once. Crimes without an ID or
+    without an outcomes row keep the street file's outcome.
+    """
+    keys = crime_keys(crime_df['Crime ID'])
+    has_id = keys != 0
+    repeated = has_id & pd.Series(keys).duplicated().to_numpy()
+    crime_df = crime_df[~repeated].reset_index(drop=True)
+    keys, has_id = keys[~repeated], has_id[~repeated]
+
+    latest = latest_outcomes(outcomes_df)
+    positions = pd.Index(latest['Crime key'].to_numpy(dtype=np.uint64)).get_indexer(keys)
+    positions[~has_id] = -1
+    matched = positions >= 0
+
+    # Merge the two label sets and overwrite the codes of the matched crimes.
+    street = pd.Categorical(crime_df['Last outcome category'])
+    updates = pd.Categorical(latest['Outcome type'])
+    categories = street.categories.union(updates.categories)
+    codes = np.append(categories.get_indexer(street.categories), -1)[street.codes]
+    update_codes = np.append(categories.get_indexer(updates.categories), -1)[updates.codes]
+    codes[matched] = update_codes[positions[matched]]
+    crime_df['Last outcome category'] = pd.Categorical.from_codes(codes, categories)
+    return crime_df
+
+
+def load_crimes_with_outcomes(folder_path=main_folder_path, columns=None, cache_dir=cache_folder_path,
+                              workers=load_workers):
+    """load_crime_data() with every crime's latest outcome from the outcomes files."""
+    columns = list(columns or ANALYSIS_COLUMNS)
+    read_columns = list(dict.fromkeys(columns + ['Crime ID', 'Last outcome category']))
+    crime_df = load_crime_data(folder_path, read_columns, cache_dir, workers)
+    crime_df = join_latest_outcomes(crime_df, load_outcomes(folder_path, workers))
+    return crime_df[columns]
+
+
+def load_tables(folder_path=main_folder_path, columns=None, cache_dir=cache_folder_path, workers=load_workers):
+    """The street crimes (with latest outcomes), outcomes and stop-and-search tables of a download."""
+    return {
+        'street': load_crimes_with_outcomes(folder_path, columns, cache_dir, workers),
+        'outcomes': load_outcomes(folder_path, workers),
+        'stop-and-search': load_stop_searches(folder_path, workers),
+    }
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+from instrument import traced
+
+# Cumulative monthly counts for any-window questions.
+# For every combination of the `by` columns (by default force, crime type and
+# outcome) the index keeps the running total of crimes up to each month, so
+# the count over any month range is one subtraction of two stored totals.
+# Rolling windows, window-over-window changes and annual rates over the real
+# span of the loaded data need no further pass over the rows.
+#
+#   index = TimeIndex.from_frame(crime_df)
+#   index.rolling(12, by='Falls within')
+#   index.compare('2024-06', '2025-05', by='Crime type')
+
+TIME_DIMENSIONS = ['Falls within', 'Crime type', 'Last outcome category']
+
+# The windows of the report's rolling rates, in months.
+ROLLING_WINDOWS = [3, 12, 24]
+
+
+def _month_numbers(months):
+    """Months since January 1970 (-1 for missing months)."""
+    months = pd.DatetimeIndex(months)
+    missing = np.asarray(months.isna())
+    numbers = np.full(len(months), -1, dtype=np.int64)
+    present = months[~missing]
+    numbers[~missing] = present.year * 12 + present.month - 1 - 1970 * 12
+    return numbers
+
+
+def _month_label(month):
+    return '' if month is None else f'{pd.Timestamp(month):%Y-%m}'
+
+
+class TimeIndex:
+    """Prefix sums of monthly crime counts, one row per combination of the key columns.
+
+    cumulative[g, m] is the number of crimes of group g in the first m months,
+    so cumulative[:, 0] is 0 and the months are contiguous (empty months included).
+    """
+
+    def __init__(self, keys, months, cumulative):
+        self.keys = keys
+        self.months = months
+        self.cumulative = cumulative
+
+    @classmethod
+    def _build(cls, key_df, months, weights=None):
+        by = list(key_df.columns)
+        groups = key_df.groupby(by, observed=True, dropna=False, sort=True)
+        codes = groups.ngroup().to_numpy()
+        keys = groups.size().index.to_frame(index=False)
+
+        numbers = _month_numbers(months)
+        keep = numbers >= 0
+        first = numbers[keep].min() if keep.any() else 0
+        n_months = int(numbers[keep].max() - first + 1) if keep.any() else 0
+        cells = codes[keep] * n_months + (numbers[keep] - first)
+        weights = None if weights is None else np.asarray(weights)[keep]
+        counts = np.bincount(cells, weights=weights, minlength=len(keys) * n_months).reshape(len(keys), n_months)
+
+        cumulative = np.zeros((len(keys), n_months + 1), dtype=np.int64)
+        cumulative[:, 1:] = np.cumsum(counts.astype(np.int64), axis=1)
+        month_index = pd.date_range(pd.Timestamp(1970 + first // 12, first % 12 + 1, 1), periods=n_months, freq='MS')
+        return cls(keys, month_index, cumulative)
+
+    @classmethod
+    @traced('build_time_index')
+    def from_frame(cls, crime_df, by=TIME_DIMENSIONS):
+        """Counts the rows of crime_df per month and combination of the `by` columns."""
+        by = [column for column in by if column in crime_df.columns]
+        return cls._build(crime_df[by], crime_df['Month'])
+
+    @classmethod
+    def from_counts(cls, counts):
+        """From counts whose index has a 'Month' level, e.g. stream_counts() or CrimeCube.query()."""
+        index = counts.index.to_frame(index=False)
+        by = [column for column in index.columns if column != 'Month']
+        return cls._build(index[by], index['Month'], counts.to_numpy())
+
+    # --- The time span ---
+
+    @property
+    def span_months(self):
+        return len(self.months)
+
+    @property
+    def years(self):
+        """Length of the loaded data in years, e.g. 2.0 for 24 months."""
+        return self.span_months / 12
+
+    def period_label(self):
+        """The loaded months as 'May 2023 - Apr 2025'."""
+        if not self.span_months:
+            return 'no data'
+        return f"{self.months[0]:%b %Y} - {self.months[-1]:%b %Y}"
+
+    def _positions(self, months, default):
+        """Positions of months from the first loaded month (may fall outside the data); None is default."""
+        months = pd.to_datetime(pd.Series(list(months), dtype=object))
+        numbers = _month_numbers(months)
+        first = _month_numbers(self.months[:1])[0] if self.span_months else 0
+        return np.where(months.isna().to_numpy(), default, numbers - first)
+
+    def _bounds(self, starts, ends):
+        """Inclusive [start, end] month windows as (first, last) positions in the cumulative columns."""
+        first = np.clip(self._positions(starts, 0), 0, self.span_months)
+        last = np.clip(self._positions(ends, self.span_months - 1) + 1, 0, self.span_months)
+        return first, np.maximum(last, first)
+
+    def _window(self, start=None, end=None):
+        first, last = self._bounds([start], [end])
+        return int(first[0]), int(last[0])
+
+    # --- Queries ---
+
+    def _aggregate(self, values, by=None, where=None):
+        """Sums the group rows of a (groups,) or (groups, windows) array over the `by` columns."""
+        keys = self.keys
+        if where:
+            keep = np.ones(len(keys), dtype=bool)
+            for column, value in where.items():
+                values_in = [value] if isinstance(value, str) or not np.iterable(value) else list(value)
+                keep &= keys[column].isin(values_in).to_numpy()
+            keys, values = keys[keep], values[keep]
+        by = list(keys.columns) if by is None else ([by] if isinstance(by, str) else list(by))
+        frame = pd.DataFrame(values.reshape(len(keys), -1), index=pd.MultiIndex.from_frame(keys))
+        if not by:
+            return frame.sum().to_frame('All crimes').T
+        return frame.groupby(level=by, observed=True, dropna=False).sum()
+
+    def counts(self, start=None, end=None, by=None, where=None):
+        """Crimes from start to end (inclusive months, None is open) per combination of `by`.
+
+        where maps a key column to a value or a list of values to keep.
+        """
+        first, last = self._window(start, end)
+        return self._aggregate(self.cumulative[:, last] - self.cumulative[:, first], by, where).iloc[:, 0].rename('Count')
+
+    def windows(self, windows, by=None, where=None):
+        """Counts of many (start, end) month windows at once, one column per window.
+
+        Every window is two lookups per group, so thousands of windows cost
+        one fancy-indexing pass over the cumulative array.
+        """
+        windows = list(windows)
+        starts, ends = [start for start, _ in windows], [end for _, end in windows]
+        first, last = self._bounds(starts, ends)
+        result = self._aggregate(self.cumulative[:, last] - self.cumulative[:, first], by, where)
+        result.columns = [f'{_month_label(start)}..{_month_label(end)}' for start, end in windows]
+        return result
+
+    def rolling(self, window=12, by=None, where=None):
+        """Crimes in the `window` months up to each month, one column per end month.
+
+        Only end months with a full window of data are returned.
+        """
+        if window > self.span_months:
+            values = np.zeros((len(self.keys), 0), dtype=np.int64)
+        else:
+            values = self.cumulative[:, window:] - self.cumulative[:, :-window]
+        result = self._aggregate(values, by, where)
+        result.columns = self.months[window - 1:] if window <= self.span_months else pd.DatetimeIndex([])
+        return result
+
+    def rolling_rates(self, population, window=12, by='Falls within', where=None, per=1000):
+        """Annualized crimes per `per` people over every rolling `window`, for a {force: population} mapping."""
+        counts = self.rolling(window, by, where)
+        forces = counts.index.get_level_values('Falls within').astype(str)
+        people = forces.map(lambda force: population.get(force, np.nan)).to_numpy(dtype=float)
+        return counts * (12 / window) / people[:, None] * per
+
+    def compare(self, start, end, by=None, where=None):
+        """Crimes in [start, end] against the window of the same length just before it."""
+        first, last = self._window(start, end)
+        length = last - first
+        previous_first = first - length
+        values = self.cumulative[:, [last, first]] - self.cumulative[:, [first, max(previous_first, 0)]]
+        result = self._aggregate(values, by, where)
+        result.columns = ['Count', 'Previous Count']
+        if previous_first < 0:
+            # The earlier window starts before the data does.
+            result['Previous Count'] = np.nan
+        result['Change'] = result['Count'] - result['Previous Count']
+        result['Change (%)'] = result['Change'] / result['Previous Count'].where(result['Previous Count'] > 0) * 100
+        return result
+
+    def annualized(self, start=None, end=None, by=None, where=None):
+        """Crimes per year over [start, end], scaled by the window's real length in months."""
+        first, last = self._window(start, end)
+        counts = self.counts(start, end, by, where)
+        return counts * 12 / (last - first) if last > first else counts * np.nan
+
+
+def rolling_rate_table(time_index, population, windows=ROLLING_WINDOWS, by=('Falls within', 'Crime type')):
+    """Annual crime rates per 1,000 people over every rolling window, as one long table."""
+    tables = []
+    for window in windows:
+        rates = time_index.rolling_rates(population, window, by=list(by))
+        if not rates.shape[1]:
+            continue
+        table = rates.rename_axis(columns='Month').stack().rename('Annual Rate per 1000').reset_index()
+        table.insert(len(by), 'Window (months)', window)
+        tables.append(table)
+    columns = list(by) + ['Window (months)', 'Month', 'Annual Rate per 1000']
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns)